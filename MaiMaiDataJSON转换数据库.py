@@ -1,5 +1,43 @@
 import json
 
+# 数据库格式版本：软件加载时检查，旧格式会在加载时补算派生字段
+SCHEMA_VERSION = 2
+
+# 全部等级，等级掩码中第 i 位对应 LEVELS[i]
+LEVELS = [
+    "1", "2", "3", "4", "5", "6", "7", "7+", "8", "8+", "9", "9+", "10", "10+",
+    "11", "11+", "12", "12+", "13", "13+", "14", "14+", "15"
+]
+LEVEL_BITS = {level: 1 << i for i, level in enumerate(LEVELS)}
+
+def parse_bpm(bpm):
+    try:
+        return float(bpm)
+    except (TypeError, ValueError):
+        return 0.0
+
+def derive_fields(alias, info):
+    """
+    计算软件运行时常用的派生字段，避免每次闪现、揭晓、搜索时重复计算。
+    """
+    levels = info.get("等级", [])
+    ds = info.get("定数", [])
+    # 各部分用换行连接，查询中不会出现换行，因此不会跨字段误匹配
+    search_key = "\n".join([info.get("歌名", ""), *alias, str(info.get("MusicID", ""))]).lower()
+    mask = 0
+    for level in levels:
+        mask |= LEVEL_BITS.get(level, 0)
+    return {
+        "搜索键": search_key,
+        "等级文本": "/".join(levels),
+        "定数文本": "/".join(map(str, ds)),
+        "列表名": f"{info.get('歌名', '')} - {info.get('artist', '未知')}",
+        "最高定数": max(ds, default=0),
+        "最低定数": min(ds, default=0),
+        "等级掩码": mask,
+        "数值BPM": parse_bpm(info.get("bpm", 0)),
+    }
+
 def process_entry(entry):
     """
     处理单个条目，将其转换为目标格式。
@@ -41,14 +79,39 @@ def process_entry(entry):
 
     return {
         "别名": alias,
-        "基础信息": processed_basic_info
+        "基础信息": processed_basic_info,
+        "派生": derive_fields(alias, processed_basic_info)
     }
 
-def main():
-    # 输入文件路径
-    input_file = 'input.json'
-    # 输出文件路径
-    output_file = 'output.json'
+def build_database(processed_entries):
+    """
+    组装带格式版本号的数据库。
+    """
+    return {
+        "格式版本": SCHEMA_VERSION,
+        "曲目": processed_entries
+    }
+
+def load_database(data):
+    """
+    检查数据库格式版本并返回曲目列表；旧格式（纯列表）在内存中补算派生字段。
+    """
+    if isinstance(data, list):
+        for item in data:
+            item["派生"] = derive_fields(item.get("别名", []), item["基础信息"])
+        return data
+    version = data.get("格式版本", 0)
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"数据库格式版本 {version} 高于软件支持的版本 {SCHEMA_VERSION}，请更新软件")
+    songs = data["曲目"]
+    if version < SCHEMA_VERSION:
+        for item in songs:
+            item["派生"] = derive_fields(item.get("别名", []), item["基础信息"])
+    return songs
+
+def main(input_file='input.json', output_file='output.json'):
+    # input_file: 输入文件路径
+    # output_file: 输出文件路径
 
     # 打开并加载原始 JSON 文件
     with open(input_file, 'r', encoding='utf-8') as f:
@@ -63,7 +126,7 @@ def main():
  
     # 将处理后的数据保存到新的 JSON 文件中
     with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(processed_entries, f, ensure_ascii=False, indent=4)
+        json.dump(build_database(processed_entries), f, ensure_ascii=False, indent=4)
 
     print(f"处理完成，结果已保存到 {output_file}")
 
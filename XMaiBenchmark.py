@@ -0,0 +1,259 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from functools import partial
+
+# GUI 相关的测试在无显示器环境下运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+converter = importlib.import_module("MaiMaiDataJSON转换数据库")
+
+LEVELS = converter.LEVELS
+SYLLABLES = ["ka", "ri", "mo", "na", "shi", "to", "ra", "yu", "mi", "ko", "ze", "pa",
+             "光", "夜", "空", "恋", "星", "花", "音", "舞", "梦", "雪", "风", "心"]
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def synthetic_word(rng, min_len=2, max_len=5):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(min_len, max_len)))
+
+
+def synthetic_raw_entry(rng, index):
+    """
+    生成一条与抓包得到的 MaimaiData 原始 json 结构相同的条目。
+    """
+    base = rng.randint(0, len(LEVELS) - 5)
+    level = [LEVELS[base + i] for i in (0, 1, 3, 4)]
+    ds = [round(rng.uniform(1, 15), 1) for _ in level]
+    title = synthetic_word(rng).title()
+    return {
+        "id": str(10000 + index),
+        "title": title,
+        "type": rng.choice(["SD", "DX"]),
+        "ds": ds,
+        "old_ds": ds,
+        "level": level,
+        # 实际数据中别名数量大多在 0~8 之间，平均约 3 个
+        "alias": [synthetic_word(rng) for _ in range(min(8, int(rng.expovariate(1 / 3))))],
+        "basic_info": {
+            "title": title,
+            "artist": synthetic_word(rng, 1, 3).title(),
+            "genre": rng.choice(["POPS&ANIME", "niconico&VOCALOID", "東方Project", "maimai"]),
+            "bpm": rng.randint(80, 240),
+            "from": rng.choice(["maimai", "maimai DX", "maimai DX FESTiVAL", "maimai DX BUDDiES"]),
+            "is_new": rng.random() < 0.05,
+            "image_url": f"{rng.getrandbits(64):016x}.png",
+            "version": "",
+        },
+    }
+
+
+def synthetic_database(size, seed=0):
+    """
+    返回 (原始条目列表, 转换后的数据库)。
+    """
+    rng = random.Random(seed)
+    raw = [synthetic_raw_entry(rng, i) for i in range(size)]
+    return raw, [converter.process_entry(entry) for entry in raw]
+
+
+def measure(func, repeat, setup=None):
+    """
+    调用 func repeat 次，返回每次耗时（毫秒）。setup 不计入耗时。
+    """
+    samples = []
+    # 被测代码中的调试输出不计入结果
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+class GuiBench:
+    """
+    在 offscreen 平台上创建真实的 MaimaiDraw 窗口，屏蔽文件对话框和弹窗。
+    """
+
+    def __init__(self, workdir):
+        from PyQt5.QtWidgets import QApplication, QFileDialog, QMessageBox
+        self.app = QApplication.instance() or QApplication(sys.argv[:1])
+        import XMaiRandomMusic
+        from XMaiDrawEngine import DrawHistory
+
+        self.workdir = workdir
+        self.dialog_path = ""
+        QFileDialog.getOpenFileName = staticmethod(lambda *args, **kwargs: (self.dialog_path, ""))
+        for name in ("information", "warning", "critical"):
+            setattr(QMessageBox, name, staticmethod(lambda *args, **kwargs: QMessageBox.Ok))
+        XMaiRandomMusic.DrawHistory = partial(DrawHistory, os.path.join(workdir, "draw_history.bin"))
+
+        self.window = XMaiRandomMusic.MaimaiDraw()
+        # 设置页和查找页默认延迟创建，测试前先全部建好
+        self.window.ensure_page(1)
+        self.window.ensure_page(2)
+        # 封面指向空目录，测试中不访问网络
+        self.window.cover_source = os.path.join(workdir, "covers")
+        self.window.session_path = os.path.join(workdir, "session.json")
+
+    def process_events(self):
+        self.app.processEvents()
+
+    def close(self):
+        self.window.close()
+        self.process_events()
+
+
+def bench_size(size, repeat, gui, workdir, results):
+    raw, data = synthetic_database(size)
+    db_path = os.path.join(workdir, f"db_{size}.json")
+    raw_path = os.path.join(workdir, f"raw_{size}.json")
+    with open(db_path, 'w', encoding='utf-8') as f:
+        json.dump(converter.build_database(data), f, ensure_ascii=False)
+    with open(raw_path, 'w', encoding='utf-8') as f:
+        json.dump(raw, f, ensure_ascii=False)
+
+    def record(name, samples):
+        results[f"{name}[{size}]"] = dict(summarize(samples), size=size)
+        print(f"  {name:<28} 中位数 {results[f'{name}[{size}]']['median_ms']:>10.3f} ms")
+
+    print(f"曲目数 {size}：")
+    out_path = os.path.join(workdir, f"out_{size}.json")
+    record("converter", measure(lambda: converter.main(raw_path, out_path), repeat))
+
+    if gui is None:
+        return
+    window = gui.window
+    gui.dialog_path = db_path
+
+    record("load_json", measure(window.load_json, repeat))
+
+    def reset_level():
+        window.data = data
+        window.catalogs.active.views.clear()  # 不计入按数据库缓存的过滤结果
+        window.level = "13"
+    record("filter_data", measure(window.filter_data, repeat, reset_level))
+
+    window.level = "全部等级"
+    window.data = data
+
+    # 逐字输入一首歌的别名，每次按键单独计时
+    target = next(item for item in data if item["别名"])
+    query = target["别名"][0][:6]
+    keystrokes = []
+    for _ in range(repeat):
+        window.search_box.blockSignals(True)
+        window.search_box.clear()
+        window.search_box.blockSignals(False)
+        for i in range(1, len(query) + 1):
+            keystrokes += measure(partial(window.search_box.setText, query[:i]), 1)
+            gui.process_events()
+    record("search_songs/keystroke", keystrokes)
+
+    # 查找页保留着搜索结果时切换界面缩放，耗时不应随曲目数增长
+    record("apply_ui_scale", measure(
+        lambda: window.apply_ui_scale(1.5 if window.ui_scale == 1 else 1.0), repeat * 2))
+    window.apply_ui_scale(1.0)
+    window.search_box.blockSignals(True)
+    window.search_box.clear()
+    window.search_box.blockSignals(False)
+
+    window.mode_combo.setCurrentIndex(0)
+    record("show_final_result/全部随机", measure(window.show_final_result, repeat * 5))
+    window.partial_list = [item["基础信息"]["MusicID"] for item in data[::10]]
+    window.mode_combo.setCurrentIndex(1)
+    record("show_final_result/部分随机", measure(window.show_final_result, repeat * 5))
+    window.mode_combo.setCurrentIndex(0)
+    window.partial_list = []
+    gui.process_events()
+
+
+def compare(results, baseline, threshold):
+    """
+    与基准结果比较中位数，返回超出阈值的退化项列表。
+    """
+    regressions = []
+    for name, current in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None or old["median_ms"] <= 0:
+            continue
+        ratio = current["median_ms"] / old["median_ms"]
+        mark = "退化" if ratio > 1 + threshold else ""
+        print(f"  {name:<36} {old['median_ms']:>10.3f} -> {current['median_ms']:>10.3f} ms  x{ratio:.2f} {mark}")
+        if mark:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XMaiRandomMusic 性能基准测试")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="合成数据库的曲目数，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数")
+    parser.add_argument("--no-gui", action="store_true", help="只测试不依赖界面的部分")
+    parser.add_argument("--output", help="把结果写入该 json 文件")
+    parser.add_argument("--baseline", help="与该 json 基准结果比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="中位数变慢超过该比例视为退化")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "covers"))
+        gui = None if args.no_gui else GuiBench(workdir)
+        try:
+            for size in (int(x) for x in args.sizes.split(",")):
+                bench_size(size, args.repeat, gui, workdir, results)
+        finally:
+            if gui is not None:
+                gui.close()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print("与基准比较：")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"共 {len(regressions)} 项退化")
+            sys.exit(1)
+        print("没有发现退化")
+
+
+if __name__ == "__main__":
+    main()
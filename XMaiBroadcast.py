@@ -0,0 +1,345 @@
+import asyncio
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import struct
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+DEFAULT_PORT = 8765
+CLIENT_QUEUE_SIZE = 64  # 每个观众端最多积压的事件数，超出后丢弃最旧的
+COVER_CACHE_SIZE = 512  # 最多缓存的封面张数
+MAX_FRAME_PAYLOAD = 125  # 观众端只发送控制帧，控制帧负载不超过 125 字节
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class _Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.queue = asyncio.Queue(CLIENT_QUEUE_SIZE)
+        self.dropped = 0
+
+    def push(self, message):
+        # 慢速客户端：丢掉最旧的事件（通常是闪现帧），保证最新状态能送达
+        while self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class BroadcastServer:
+    """
+    局域网广播服务器：HTTP 提供 index.html 与已下载的封面，WebSocket 推送抽选事件。
+    在独立线程的 asyncio 事件循环中运行，publish/put_cover 可以从 Qt 主线程直接调用。
+    """
+
+    def __init__(self, host="0.0.0.0", port=DEFAULT_PORT, root_dir=ROOT_DIR):
+        self.host = host
+        self.port = port
+        self.root_dir = root_dir
+        self.clients = set()
+        self.covers = OrderedDict()  # image_url -> (bytes, content_type)
+        self.last_result = None  # 新连接的观众端会先收到最近一次结果
+        self.loop = None
+        self.server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    # ---- 线程控制 ----
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._ready.clear()
+        self._startup_error = None
+        self._thread = threading.Thread(target=self._run, name="XMaiBroadcast", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._startup_error
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, self.host, self.port)
+            )
+            # 端口为 0 时由系统分配，回填实际端口
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._startup_error = e
+            self.loop.close()
+            self.loop = None
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self.loop.call_soon_threadsafe(self._close_clients)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._thread = None
+        self.loop = None
+        self.server = None
+
+    def is_running(self):
+        return self._thread is not None
+
+    # ---- 线程安全的对外接口 ----
+
+    def publish(self, event):
+        """
+        推送一个抽选事件（countdown / flash / result / cover），可从任意线程调用。
+        """
+        if self.loop is None:
+            return
+        message = json.dumps(event, ensure_ascii=False)
+        self.loop.call_soon_threadsafe(self._fanout, event.get("type"), message)
+
+    def put_cover(self, image_url, data):
+        """
+        缓存一张已下载的封面，观众端通过 /covers/<image_url> 获取。
+        """
+        if self.loop is None:
+            return
+        content_type = mimetypes.guess_type(image_url)[0] or "image/png"
+        self.loop.call_soon_threadsafe(self._store_cover, image_url, bytes(data), content_type)
+
+    # ---- 事件循环内部 ----
+
+    def _fanout(self, event_type, message):
+        if event_type == "result":
+            self.last_result = message
+        for client in self.clients:
+            client.push(message)
+
+    def _store_cover(self, image_url, data, content_type):
+        self.covers[image_url] = (data, content_type)
+        self.covers.move_to_end(image_url)
+        while len(self.covers) > COVER_CACHE_SIZE:
+            self.covers.popitem(last=False)
+
+    def _close_clients(self):
+        for client in self.clients:
+            client.writer.close()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if len(parts) < 2 or parts[0] not in ("GET", "HEAD"):
+                await self._send_response(writer, 405, b"Method Not Allowed")
+                return
+
+            method, path = parts[0], parts[1].split("?", 1)[0]
+            if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._handle_websocket(reader, writer, headers)
+            elif path in ("/", "/index.html"):
+                await self._send_file(writer, os.path.join(self.root_dir, "index.html"), method)
+            elif path.startswith("/covers/"):
+                cover = self.covers.get(unquote(path[len("/covers/"):]))
+                if cover is None:
+                    # 只提供已经下载过的封面，不代替观众端访问外网
+                    await self._send_response(writer, 404, b"Not Found")
+                else:
+                    await self._send_response(writer, 200, cover[0], cover[1], method,
+                                              {"Cache-Control": "max-age=86400"})
+            else:
+                await self._send_response(writer, 404, b"Not Found")
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # 服务器关闭时会取消所有连接任务，直接结束即可
+            pass
+        finally:
+            writer.close()
+
+    async def _send_file(self, writer, file_path, method):
+        try:
+            with open(file_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            await self._send_response(writer, 404, b"Not Found")
+            return
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        await self._send_response(writer, 200, body, content_type, method)
+
+    async def _send_response(self, writer, status, body, content_type="text/plain; charset=utf-8",
+                             method="GET", extra_headers=None):
+        reasons = {200: "OK", 304: "Not Modified", 404: "Not Found", 405: "Method Not Allowed"}
+        head = [
+            f"HTTP/1.1 {status} {reasons.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        for name, value in (extra_headers or {}).items():
+            head.append(f"{name}: {value}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        if method != "HEAD":
+            writer.write(body)
+        await writer.drain()
+
+    async def _handle_websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode("ascii")).digest()).decode("ascii")
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode("latin-1"))
+        await writer.drain()
+
+        client = _Client(writer)
+        if self.last_result is not None:
+            client.push(self.last_result)
+        self.clients.add(client)
+        sender = asyncio.ensure_future(self._client_sender(client))
+        try:
+            await self._client_reader(reader, writer)
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+
+    async def _client_sender(self, client):
+        try:
+            while True:
+                message = await client.queue.get()
+                client.writer.write(encode_frame(0x1, message.encode("utf-8")))
+                # drain 让慢速连接在 TCP 层形成背压，期间新事件在队列中合并
+                await client.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    async def _client_reader(self, reader, writer):
+        # 观众端只读，这里仅处理 ping / close 控制帧
+        while True:
+            try:
+                opcode, payload = await read_frame(reader)
+            except ValueError:
+                # 1009：消息过大，随后由 _handle_connection 关闭连接
+                writer.write(encode_frame(0x8, struct.pack("!H", 1009)))
+                await writer.drain()
+                return
+            if opcode == 0x8:
+                writer.write(encode_frame(0x8, payload[:2]))
+                await writer.drain()
+                return
+            if opcode == 0x9:
+                writer.write(encode_frame(0xA, payload))
+                await writer.drain()
+
+
+def encode_frame(opcode, payload):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_frame(reader):
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > MAX_FRAME_PAYLOAD:
+        raise ValueError(f"帧长度 {length} 超过上限 {MAX_FRAME_PAYLOAD}")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def song_payload(item):
+    """
+    把数据库条目转换为推送给观众端的精简信息。
+    """
+    info = item["基础信息"]
+    return {
+        "MusicID": info.get("MusicID", ""),
+        "歌名": info.get("歌名", ""),
+        "artist": info.get("artist", ""),
+        "bpm": info.get("bpm", ""),
+        "版本": info.get("版本", ""),
+        "type": info.get("type", ""),
+        "等级": info.get("等级", []),
+        "定数": info.get("定数", []),
+        "别名": item.get("别名", []),
+        "image_url": info.get("image_url", ""),
+    }
+
+
+def main():
+    import argparse
+    import random
+    import time
+
+    from MaiMaiDataJSON转换数据库 import load_database
+
+    parser = argparse.ArgumentParser(description="在本机启动广播服务器，可选地推送演示抽选事件")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--demo", metavar="JSON", help="使用该数据库循环推送演示抽选")
+    args = parser.parse_args()
+
+    server = BroadcastServer(args.host, args.port)
+    server.start()
+    print(f"观众端地址：http://{args.host}:{server.port}/?spectator")
+    try:
+        if args.demo:
+            with open(args.demo, 'r', encoding='utf-8') as f:
+                data = load_database(json.load(f))
+            while True:
+                for count in range(5, 0, -1):
+                    server.publish({"type": "countdown", "value": count})
+                    for _ in range(20):
+                        server.publish({"type": "flash", "song": song_payload(random.choice(data))})
+                        time.sleep(0.05)
+                server.publish({"type": "result", "song": song_payload(random.choice(data))})
+                time.sleep(5)
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from MaiMaiDataJSON转换数据库 import load_database
+from XMaiDrawEngine import filter_by_level
+
+CONTAINERS = (dict, list)
+
+
+class Catalog:
+    """
+    一个已加载的曲目数据库。data 中的曲目对象与其它数据库共享，不能原地修改。
+    """
+
+    def __init__(self, name, path, data, keys):
+        self.name = name
+        self.path = path
+        self.data = data
+        self.keys = keys  # 每首曲目在 CatalogStore.songs 中的摘要
+        self.views = {}  # 等级 -> 过滤结果，切换数据库或等级时直接复用
+
+    def view(self, level):
+        songs = self.views.get(level)
+        if songs is None:
+            songs = self.views[level] = filter_by_level(self.data, level)
+        return songs
+
+
+class CatalogStore:
+    """
+    同时保存多个数据库：字符串统一驻留，内容完全相同的曲目只保存一份。
+    """
+
+    def __init__(self):
+        self.strings = {}
+        self.songs = {}  # 曲目内容摘要 -> 共享的曲目对象
+        self.refs = {}  # 曲目内容摘要 -> 引用它的数据库数量
+        self.catalogs = OrderedDict()  # 路径 -> Catalog
+        self.active = None
+
+    def _intern(self, value):
+        # 叶子节点直接在推导式里处理，减少函数调用
+        intern, walk = self.strings.setdefault, self._intern
+        if type(value) is dict:
+            return {intern(k, k): intern(v, v) if type(v) is str else walk(v) if type(v) in CONTAINERS else v
+                    for k, v in value.items()}
+        if type(value) is list:
+            return [intern(v, v) if type(v) is str else walk(v) if type(v) in CONTAINERS else v
+                    for v in value]
+        if type(value) is str:
+            return intern(value, value)
+        return value
+
+    def _share(self, item):
+        # 转换脚本输出的键顺序固定，内容相同的曲目序列化结果也相同
+        key = hashlib.blake2b(json.dumps(item).encode("ascii"), digest_size=16).digest()
+        song = self.songs.get(key)
+        if song is None:
+            song = self.songs[key] = self._intern(item)
+            self.refs[key] = 0
+        self.refs[key] += 1
+        return key, song
+
+    def load(self, path):
+        """
+        加载数据库并设为当前数据库；同一路径重复加载时替换旧内容。
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = load_database(json.load(f))
+        if path in self.catalogs:
+            self.unload(path)
+        keys, songs = [], []
+        for item in data:
+            key, song = self._share(item)
+            keys.append(key)
+            songs.append(song)
+        catalog = Catalog(os.path.basename(path), path, songs, keys)
+        self.catalogs[path] = catalog
+        self.active = catalog
+        return catalog
+
+    def activate(self, path):
+        self.active = self.catalogs[path]
+        return self.active
+
+    def unload(self, path):
+        catalog = self.catalogs.pop(path)
+        for key in catalog.keys:
+            self.refs[key] -= 1
+            if self.refs[key] == 0:
+                del self.refs[key]
+                del self.songs[key]
+        if self.active is catalog:
+            self.active = next(reversed(self.catalogs.values()), None)
+        # 从剩余曲目重建字符串池，丢掉只被卸载曲目引用的字符串
+        self.strings = {}
+        for song in self.songs.values():
+            self._collect(song)
+
+    def _collect(self, value):
+        # 剩余曲目中的字符串已经是驻留对象，原样放回池中即可
+        if type(value) is dict:
+            for k, v in value.items():
+                self.strings[k] = k
+                if type(v) is str:
+                    self.strings[v] = v
+                elif type(v) in CONTAINERS:
+                    self._collect(v)
+        elif type(value) is list:
+            for v in value:
+                if type(v) is str:
+                    self.strings[v] = v
+                elif type(v) in CONTAINERS:
+                    self._collect(v)
+
+    def stats(self):
+        total = sum(len(catalog.data) for catalog in self.catalogs.values())
+        return {"catalogs": len(self.catalogs), "songs": total, "unique_songs": len(self.songs),
+                "strings": len(self.strings)}
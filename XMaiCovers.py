@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote
+
+from MaiMaiDataJSON转换数据库 import load_database
+
+# 封面来源：远程地址、局域网镜像地址（均以 http(s):// 开头）或本地目录
+DEFAULT_COVER_SOURCE = "https://maimaidx.jp/maimai-mobile/img/Music/"
+DEFAULT_MIRROR_PORT = 8766
+
+
+def is_remote_source(source):
+    return source.startswith(("http://", "https://"))
+
+
+def cover_url(source, image_url):
+    """
+    根据封面来源拼出某张封面的地址，本地目录返回 file:// 地址。
+    """
+    if is_remote_source(source):
+        return source.rstrip("/") + "/" + image_url
+    return Path(source, image_url).resolve().as_uri()
+
+
+class CoverMirrorHandler(BaseHTTPRequestHandler):
+    cover_dir = "."
+
+    def do_HEAD(self):
+        self.serve_cover(send_body=False)
+
+    def do_GET(self):
+        self.serve_cover(send_body=True)
+
+    def serve_cover(self, send_body):
+        name = unquote(self.path.split("?", 1)[0].lstrip("/"))
+        if not name or "/" in name or "\\" in name or name.startswith("."):
+            self.send_error(404)
+            return
+        path = os.path.join(self.cover_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.send_error(404)
+            return
+
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = formatdate(int(stat.st_mtime), usegmt=True)
+        if self.not_modified(etag, int(stat.st_mtime)):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Cache-Control", "public, max-age=86400")
+            self.end_headers()
+            return
+
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", self.guess_type(name))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def not_modified(self, etag, mtime):
+        # If-None-Match 优先于 If-Modified-Since
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def guess_type(self, name):
+        ext = os.path.splitext(name)[1].lower()
+        return {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
+                ".webp": "image/webp"}.get(ext, "application/octet-stream")
+
+    def log_message(self, format, *args):
+        pass  # 局域网内请求量很大，不逐条打印
+
+
+def serve_mirror(cover_dir, host="0.0.0.0", port=DEFAULT_MIRROR_PORT):
+    """
+    创建封面镜像服务器，由调用方执行 serve_forever()。
+    """
+    handler = type("BoundCoverMirrorHandler", (CoverMirrorHandler,), {"cover_dir": cover_dir})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def prefetch_covers(db_path, cover_dir, source=DEFAULT_COVER_SOURCE, workers=8):
+    """
+    按数据库下载全部封面到 cover_dir，已存在的文件跳过。
+    """
+    with open(db_path, 'r', encoding='utf-8') as f:
+        data = load_database(json.load(f))
+    os.makedirs(cover_dir, exist_ok=True)
+    names = sorted({
+        item["基础信息"]["image_url"] for item in data
+        if item["基础信息"].get("image_url")
+    })
+    missing = [name for name in names if not os.path.exists(os.path.join(cover_dir, name))]
+
+    def fetch(name):
+        target = os.path.join(cover_dir, name)
+        try:
+            with urllib.request.urlopen(cover_url(source, name), timeout=30) as response:
+                body = response.read()
+        except OSError as e:
+            return name, str(e)
+        # 先写临时文件再改名，避免镜像服务器读到半张图片
+        with open(target + ".part", "wb") as f:
+            f.write(body)
+        os.replace(target + ".part", target)
+        return name, None
+
+    failed = 0
+    with ThreadPoolExecutor(workers) as pool:
+        for i, (name, error) in enumerate(pool.map(fetch, missing), 1):
+            if error:
+                failed += 1
+                print(f"[{i}/{len(missing)}] {name} 下载失败：{error}")
+    print(f"封面共 {len(names)} 张，本次下载 {len(missing) - failed} 张，失败 {failed} 张")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="封面预下载与局域网镜像服务器")
+    parser.add_argument("cover_dir", help="封面目录")
+    parser.add_argument("--prefetch", metavar="JSON", help="先按该数据库下载缺失的封面")
+    parser.add_argument("--source", default=DEFAULT_COVER_SOURCE, help="预下载时使用的封面来源")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_MIRROR_PORT)
+    parser.add_argument("--no-serve", action="store_true", help="只预下载，不启动镜像服务器")
+    args = parser.parse_args()
+
+    if args.prefetch:
+        prefetch_covers(args.prefetch, args.cover_dir, args.source)
+    if args.no_serve:
+        return
+
+    server = serve_mirror(args.cover_dir, args.host, args.port)
+    print(f"封面镜像已启动，各机位在[设置]中将封面来源填写为 http://本机IP:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+import random
+import struct
+import time
+from collections import deque
+
+from MaiMaiDataJSON转换数据库 import LEVEL_BITS
+
+# 历史记录文件格式：8 字节文件头 + 定长记录（抽选时间戳 + MusicID）
+HISTORY_MAGIC = b"XMAIHIS1"
+HISTORY_RECORD = struct.Struct("<d16s")
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "draw_history.bin")
+
+
+class DrawHistory:
+    """
+    抽选历史记录：追加写入的二进制日志 + 最近 N 首的内存窗口。
+    path 为 None 时只保存在内存中（用于模拟与测试）。
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, window=20):
+        self.path = path
+        self.window = max(0, int(window))
+        self.recent = deque()
+        self.recent_counts = {}  # MusicID -> 在窗口内出现的次数，用于 O(1) 判断
+        self.total = 0
+        self._file = None
+        self._open()
+        self.replay_tail()
+
+    def _open(self):
+        if self.path is None:
+            return
+        self._file = open(self.path, "a+b")
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size < len(HISTORY_MAGIC):
+            # 空文件，或第一次写文件头时崩溃留下的半个文件头，重新写入
+            self._file.truncate(0)
+            self._file.write(HISTORY_MAGIC)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            size = len(HISTORY_MAGIC)
+        else:
+            self._file.seek(0)
+            if self._file.read(len(HISTORY_MAGIC)) != HISTORY_MAGIC:
+                raise ValueError(f"历史记录文件格式错误：{self.path}")
+
+        # 崩溃时可能留下半条记录，截掉不完整的尾部
+        body = size - len(HISTORY_MAGIC)
+        broken = body % HISTORY_RECORD.size
+        if broken:
+            self._file.truncate(size - broken)
+            size -= broken
+        self.total = (size - len(HISTORY_MAGIC)) // HISTORY_RECORD.size
+
+    def replay_tail(self):
+        """
+        只读取日志末尾的 window 条记录来重建内存窗口。
+        """
+        self.recent.clear()
+        self.recent_counts.clear()
+        count = min(self.window, self.total)
+        if count == 0 or self._file is None:
+            return
+        self._file.seek(len(HISTORY_MAGIC) + (self.total - count) * HISTORY_RECORD.size)
+        chunk = self._file.read(count * HISTORY_RECORD.size)
+        for _, raw_id in HISTORY_RECORD.iter_unpack(chunk):
+            self._push(raw_id.rstrip(b"\0").decode("utf-8"))
+
+    def set_window(self, window):
+        window = max(0, int(window))
+        if window == self.window:
+            return
+        self.window = window
+        if self._file is None:
+            # 只在内存中记录时无法回读日志：窗口缩小时丢掉最早的记录，变大时保留现有记录
+            self._trim()
+        else:
+            self.replay_tail()
+
+    def _push(self, music_id):
+        if self.window == 0:
+            return
+        self.recent.append(music_id)
+        self.recent_counts[music_id] = self.recent_counts.get(music_id, 0) + 1
+        self._trim()
+
+    def _trim(self):
+        while len(self.recent) > self.window:
+            old = self.recent.popleft()
+            if self.recent_counts[old] == 1:
+                del self.recent_counts[old]
+            else:
+                self.recent_counts[old] -= 1
+
+    def record(self, music_id, timestamp=None):
+        music_id = str(music_id)
+        raw_id = music_id.encode("utf-8")
+        if len(raw_id) > 16:
+            raise ValueError(f"MusicID 过长：{music_id}")
+        if self._file is not None:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(HISTORY_RECORD.pack(time.time() if timestamp is None else timestamp, raw_id))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.total += 1
+        self._push(music_id)
+
+    def is_recent(self, music_id):
+        return music_id in self.recent_counts
+
+    def exclude_recent(self, candidates):
+        if not self.recent_counts:
+            return candidates
+        recent = self.recent_counts
+        return [x for x in candidates if x["基础信息"]["MusicID"] not in recent]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def filter_by_level(data, level):
+    """
+    按等级筛选曲目，level 为 "全部等级" 时返回原列表。
+    """
+    if level == "全部等级":
+        return data
+    bit = LEVEL_BITS[level]
+    return [item for item in data if item["派生"]["等级掩码"] & bit]
+
+
+def read_partial_list(path):
+    """
+    读取部分随机列表文件：每行一个或多个以逗号分隔的 MusicID。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = [line.strip().split(',') for line in f if line.strip()]
+    return [item.strip() for row in rows for item in row]
+
+
+def build_candidates(data, random_mode=0, partial_list=()):
+    """
+    按随机模式得到候选曲目：0 为全部随机，1 为只从部分列表中抽选。
+    """
+    if not data:
+        raise ValueError("数据库未加载")
+    if random_mode == 1 and not partial_list:
+        raise ValueError("部分随机模式需要加载列表文件")
+
+    if random_mode == 0:
+        candidates = data
+    else:
+        partial_ids = set(partial_list)
+        candidates = [x for x in data if x["基础信息"]["MusicID"] in partial_ids]
+
+    if not candidates:
+        raise ValueError("没有符合条件的曲目")
+    return candidates
+
+
+def draw_song(candidates, history=None, rng=random):
+    """
+    从候选曲目中抽一首，排除最近抽过的曲目；候选全部被排除时退回完整候选池。
+    返回 (抽中的曲目, 是否发生了退回)。
+    """
+    pool = candidates
+    if history is not None:
+        pool = history.exclude_recent(candidates)
+    fallback = not pool
+    if fallback:
+        pool = candidates
+    return rng.choice(pool), fallback
@@ -0,0 +1,266 @@
+import argparse
+import json
+import math
+import os
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+from MaiMaiDataJSON转换数据库 import load_database
+from XMaiDrawEngine import DrawHistory, build_candidates, draw_song, filter_by_level, read_partial_list
+
+DEFAULT_DRAWS = 1000000
+DEFAULT_VERIFY_DRAWS = 20000
+
+
+def chi_square_p_value(chi2, df):
+    """
+    卡方分布的上尾概率（Wilson–Hilferty 近似，自由度较大时足够准确）。
+    """
+    if df <= 0:
+        return 1.0
+    z = ((chi2 / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def simulate_draws(pool_size, draws, window, seed=None, batch=1 << 16):
+    """
+    模拟 draw_song + DrawHistory 的抽选规则，返回 (每次抽中的候选序号, 退回完整候选池的次数)。
+    没有防重复窗口时整批向量化生成；有窗口时随机数按批生成，
+    可抽集合用交换删除维护，每次抽选 O(1)。
+    """
+    rng = np.random.default_rng(seed)
+    if window == 0:
+        return rng.integers(0, pool_size, size=draws, dtype=np.int32), 0
+
+    picks = np.empty(draws, dtype=np.int32)
+    avail = list(range(pool_size))  # 不在窗口内、可以抽到的候选
+    pos = list(range(pool_size))  # 候选在 avail 中的位置
+    counts = [0] * pool_size  # 候选在窗口内出现的次数
+    recent = deque()
+    fallbacks = 0
+    for start in range(0, draws, batch):
+        out = []
+        for x in rng.random(min(batch, draws - start)).tolist():
+            n = len(avail)
+            if n:
+                song = avail[min(int(x * n), n - 1)]
+                last = avail.pop()
+                if last != song:
+                    avail[pos[song]] = last
+                    pos[last] = pos[song]
+            else:
+                # 候选全部在窗口内，与 draw_song 一样退回完整候选池
+                fallbacks += 1
+                song = min(int(x * pool_size), pool_size - 1)
+            counts[song] += 1
+            recent.append(song)
+            if len(recent) > window:
+                old = recent.popleft()
+                counts[old] -= 1
+                if counts[old] == 0:
+                    pos[old] = len(avail)
+                    avail.append(old)
+            out.append(song)
+        picks[start:start + len(out)] = out
+    return picks, fallbacks
+
+
+def engine_draws(candidates, draws, window, seed=None):
+    """
+    直接调用程序中的 draw_song 与内存版 DrawHistory 抽选，用于核对模拟结果。
+    """
+    rng = random.Random(seed)
+    history = DrawHistory(None, window)
+    index = {id(item): i for i, item in enumerate(candidates)}
+    picks = np.empty(draws, dtype=np.int32)
+    fallbacks = 0
+    for i in range(draws):
+        item, fallback = draw_song(candidates, history, rng)
+        history.record(item["基础信息"]["MusicID"])
+        picks[i] = index[id(item)]
+        fallbacks += fallback
+    return picks, fallbacks
+
+
+def draw_statistics(picks, pool_size, window, fallbacks, alpha):
+    """
+    统计每首曲目的抽中次数、卡方检验与重复间隔。
+    """
+    draws = len(picks)
+    freq = np.bincount(picks, minlength=pool_size)
+    expected = draws / pool_size
+    chi2 = float(((freq - expected) ** 2 / expected).sum())
+    p_value = chi_square_p_value(chi2, pool_size - 1)
+
+    # 同一首曲目相邻两次抽中之间隔了几次抽选
+    order = np.argsort(picks, kind="stable")
+    same = picks[order][1:] == picks[order][:-1]
+    gaps = np.diff(order)[same]
+    violations = int((gaps <= window).sum())
+
+    return {
+        "draws": draws,
+        "pool_size": pool_size,
+        "window": window,
+        "expected": expected,
+        "freq": freq,
+        "freq_min": int(freq.min()),
+        "freq_max": int(freq.max()),
+        "freq_std": float(freq.std()),
+        "max_deviation": float(np.abs(freq - expected).max() / expected),
+        "chi2": chi2,
+        "df": pool_size - 1,
+        "p_value": p_value,
+        "repeats": int(len(gaps)),
+        "min_gap": int(gaps.min()) if len(gaps) else None,
+        "mean_gap": float(gaps.mean()) if len(gaps) else None,
+        "immediate_repeats": int((gaps == 1).sum()),
+        "violations": violations,
+        "fallbacks": fallbacks,
+        # 候选数不超过窗口时必然退回完整候选池，此时窗口内重复是预期行为
+        "no_repeat_ok": violations == 0 or pool_size <= window,
+        "uniform_ok": p_value >= alpha,
+    }
+
+
+def song_name(item):
+    return item["派生"]["列表名"]
+
+
+def render_report(meta, candidates, sim, engine, alpha, top=10):
+    """
+    生成可以随赛事规则一起公开的 Markdown 报告。
+    """
+    yes = lambda ok: "通过" if ok else "未通过"
+    lines = [
+        "# XMaiRandomMusic 抽选公平性报告",
+        "",
+        f"- 生成时间：{meta['time']}",
+        f"- 数据库：{meta['database']}（共 {meta['total_songs']} 首）",
+        f"- 等级筛选：{meta['level']}",
+        f"- 随机模式：{meta['mode']}",
+        f"- 候选曲目数：{sim['pool_size']}",
+        f"- 防重复窗口：最近 {sim['window']} 首内不重复",
+        "- 抽选权重：候选曲目等概率（程序不设权重）",
+        f"- 模拟次数：{sim['draws']}，随机种子：{meta['seed']}",
+        "",
+        "## 规则检查",
+        "",
+        "| 项目 | 结果 |",
+        "| --- | --- |",
+        f"| 等概率（卡方检验，显著性水平 {alpha}） | {yes(sim['uniform_ok'])} |",
+        f"| 最近 {sim['window']} 首内不重复 | {yes(sim['no_repeat_ok'])} |",
+    ]
+    if engine is not None:
+        lines.append(f"| 程序实际抽选代码复核（{engine['draws']} 次） | "
+                     f"{yes(engine['uniform_ok'] and engine['no_repeat_ok'])} |")
+
+    lines += [
+        "",
+        "## 抽中次数",
+        "",
+        f"- 每首期望次数：{sim['expected']:.1f}",
+        f"- 最少 / 最多：{sim['freq_min']} / {sim['freq_max']}，标准差 {sim['freq_std']:.2f}",
+        f"- 与期望的最大相对偏差：{sim['max_deviation'] * 100:.2f}%",
+        f"- 卡方值：{sim['chi2']:.2f}，自由度 {sim['df']}，p 值 {sim['p_value']:.4f}",
+    ]
+    if sim["window"]:
+        lines.append("- 防重复窗口会让各曲目的次数比完全独立抽选更平均，p 值接近 1 属于正常现象")
+
+    order = np.argsort(sim["freq"], kind="stable")
+    for title, picked in (("抽中最多", order[::-1][:top]), ("抽中最少", order[:top])):
+        lines += ["", f"### {title}", "", "| 曲目 | 次数 |", "| --- | --- |"]
+        lines += [f"| {song_name(candidates[i])} | {sim['freq'][i]} |" for i in picked]
+
+    lines += [
+        "",
+        "## 重复统计",
+        "",
+        f"- 重复抽中次数：{sim['repeats']}",
+        f"- 最小间隔：{sim['min_gap']}，平均间隔：{sim['mean_gap'] or 0:.2f}（等概率时约为候选曲目数）",
+        f"- 连续两次抽中同一首：{sim['immediate_repeats']}",
+        f"- 窗口内重复：{sim['violations']}",
+        f"- 候选全部在窗口内而退回完整候选池：{sim['fallbacks']}",
+    ]
+    if engine is not None:
+        lines += [
+            "",
+            "## 实际抽选代码复核",
+            "",
+            "直接调用程序揭晓结果时使用的 draw_song 与抽选历史，",
+            f"抽选 {engine['draws']} 次：卡方值 {engine['chi2']:.2f}，p 值 {engine['p_value']:.4f}，"
+            f"最小间隔 {engine['min_gap']}，窗口内重复 {engine['violations']}。",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def json_report(meta, candidates, sim, engine):
+    strip = lambda stats: {k: v for k, v in stats.items() if k != "freq"}
+    return {
+        "meta": meta,
+        "simulation": strip(sim),
+        "engine": strip(engine) if engine is not None else None,
+        "frequency": {
+            song["基础信息"]["MusicID"]: int(count)
+            for song, count in zip(candidates, sim["freq"])
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽选公平性模拟")
+    parser.add_argument("database", help="转换后的数据库 json")
+    parser.add_argument("--level", default="全部等级", help="等级筛选，与设置页一致")
+    parser.add_argument("--list", help="部分随机列表 txt，指定时按部分随机模式抽选")
+    parser.add_argument("--window", type=int, default=20, help="防重复窗口（首）")
+    parser.add_argument("--draws", type=int, default=DEFAULT_DRAWS, help="模拟抽选次数")
+    parser.add_argument("--verify-draws", type=int, default=DEFAULT_VERIFY_DRAWS,
+                        help="用程序实际抽选代码复核的次数，0 为不复核")
+    parser.add_argument("--seed", type=int, help="随机种子，便于复现报告")
+    parser.add_argument("--alpha", type=float, default=0.01, help="卡方检验的显著性水平")
+    parser.add_argument("--report", default="fairness_report.md", help="Markdown 报告路径")
+    parser.add_argument("--json", help="同时把完整结果写入该 json 文件")
+    args = parser.parse_args()
+
+    with open(args.database, 'r', encoding='utf-8') as f:
+        data = load_database(json.load(f))
+    partial_list = read_partial_list(args.list) if args.list else []
+    candidates = build_candidates(filter_by_level(data, args.level), 1 if args.list else 0, partial_list)
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    window = max(0, args.window)
+
+    meta = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "database": os.path.basename(args.database),
+        "total_songs": len(data),
+        "level": args.level,
+        "mode": f"部分随机（{os.path.basename(args.list)}）" if args.list else "全部随机",
+        "seed": seed,
+    }
+
+    start = time.perf_counter()
+    picks, fallbacks = simulate_draws(len(candidates), args.draws, window, seed)
+    sim = draw_statistics(picks, len(candidates), window, fallbacks, args.alpha)
+    print(f"模拟 {args.draws} 次抽选用时 {time.perf_counter() - start:.2f} 秒")
+
+    engine = None
+    if args.verify_draws > 0:
+        start = time.perf_counter()
+        picks, fallbacks = engine_draws(candidates, args.verify_draws, window, seed)
+        engine = draw_statistics(picks, len(candidates), window, fallbacks, args.alpha)
+        print(f"实际抽选代码复核 {args.verify_draws} 次用时 {time.perf_counter() - start:.2f} 秒")
+
+    with open(args.report, 'w', encoding='utf-8') as f:
+        f.write(render_report(meta, candidates, sim, engine, args.alpha))
+    print(f"候选 {sim['pool_size']} 首，卡方 p 值 {sim['p_value']:.4f}，窗口内重复 {sim['violations']} 次")
+    print(f"报告已保存到 {args.report}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(json_report(meta, candidates, sim, engine), f, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
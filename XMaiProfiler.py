@@ -0,0 +1,169 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# 延迟直方图的桶上限（毫秒），最后一个桶收集所有更慢的样本
+HISTOGRAM_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class LatencyHistogram:
+    """
+    固定分桶的累计直方图 + 最近 window 个样本，用来计算滚动分位数。
+    """
+
+    def __init__(self, window=1000):
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.recent = deque(maxlen=window)
+        self.count = 0
+        self.last = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS, ms)] += 1
+        self.recent.append(ms)
+        self.count += 1
+        self.last = ms
+
+    def percentile(self, p):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """
+    轻量的性能统计：按操作名记录耗时直方图、计数器与 trace 事件。
+    关闭时 span() 直接返回共享的空对象，几乎没有额外开销。
+    """
+
+    def __init__(self, enabled=False, window=1000, trace_limit=100000):
+        self.enabled = enabled
+        self.window = window
+        self.histograms = {}
+        self.counters = {}  # 计数器与当前值（如进行中的网络请求数）不受开关影响
+        self.marks = {}  # 一次性的数值，如启动耗时
+        self.trace = deque(maxlen=trace_limit)
+        self.frames = deque(maxlen=240)
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def span(self, name):
+        return _Span(self, name) if self.enabled else NULL_SPAN
+
+    def now(self):
+        return time.perf_counter()
+
+    def record(self, name, start, end=None):
+        """
+        记录一次从 start 到 end（默认现在）的操作耗时，start/end 来自 now()。
+        """
+        if not self.enabled:
+            return
+        end = time.perf_counter() if end is None else end
+        ms = (end - start) * 1000
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram(self.window)
+            histogram.add(ms)
+            self.trace.append((name, start, end, threading.get_ident()))
+
+    def count(self, name, delta=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + delta
+
+    def mark(self, name, value):
+        self.marks[name] = value
+
+    def frame(self):
+        if self.enabled:
+            self.frames.append(time.perf_counter())
+
+    def fps(self):
+        frames = list(self.frames)
+        # 超过 1 秒没有新帧时视为静止画面
+        if len(frames) < 2 or time.perf_counter() - frames[-1] > 1:
+            return 0.0
+        return (len(frames) - 1) / (frames[-1] - frames[0])
+
+    def frame_time_p95(self):
+        frames = list(self.frames)
+        gaps = sorted((b - a) * 1000 for a, b in zip(frames, frames[1:]))
+        return gaps[min(len(gaps) - 1, int(len(gaps) * 0.95))] if gaps else 0.0
+
+    def hit_rate(self, prefix):
+        hits = self.counters.get(f"{prefix}.hit", 0)
+        total = hits + self.counters.get(f"{prefix}.miss", 0)
+        return hits / total if total else 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {
+                    "count": h.count,
+                    "last_ms": round(h.last, 3),
+                    "p50_ms": round(h.percentile(0.5), 3),
+                    "p95_ms": round(h.percentile(0.95), 3),
+                    "buckets": dict(zip([*map(str, HISTOGRAM_BUCKETS), "inf"], h.buckets)),
+                }
+                for name, h in self.histograms.items()
+            }
+
+    def export_trace(self, path):
+        """
+        导出 Chrome trace 格式（可在 chrome://tracing 或 Perfetto 中打开）。
+        """
+        with self.lock:
+            events = [
+                {
+                    "name": name, "ph": "X", "pid": os.getpid(), "tid": tid,
+                    "ts": round((start - self.origin) * 1e6, 1),
+                    "dur": round((end - start) * 1e6, 1),
+                }
+                for name, start, end, tid in self.trace
+            ]
+            counters = dict(self.counters)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "traceEvents": events,
+                "otherData": {"counters": counters, "marks": dict(self.marks), "histograms": self.snapshot()},
+            }, f, ensure_ascii=False)
+
+
+# 全局实例，设置环境变量 XMAI_PROFILE=1 时启动即开启
+profiler = Profiler(enabled=os.environ.get("XMAI_PROFILE") == "1")
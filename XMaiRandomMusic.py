@@ -1,17 +1,34 @@
+import time
+STARTUP_TIME = time.perf_counter()  # 用于统计启动耗时，需在导入 Qt 之前记录
 import sys
-import json
+import os
 import random
+import re
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget, QHBoxLayout, QPushButton, QLabel,
     QComboBox, QFileDialog, QTextEdit, QCheckBox, QLineEdit, QScrollArea,
     QFrame, QMessageBox, QGraphicsBlurEffect, QGraphicsView, QGraphicsScene, QStackedWidget, QFormLayout,
-    QListWidget, QListWidgetItem
+    QListWidget, QListWidgetItem, QSpinBox, QShortcut
 )
-from PyQt5.QtNetwork import QNetworkRequest, QNetworkAccessManager, QNetworkReply
-from PyQt5.QtGui import QDesktopServices, QPainter, QColor, QBrush, QFont, QMovie, QPixmap, QPalette
-from PyQt5.QtCore import Qt, QTimer, QRect, QEasingCurve, QPropertyAnimation, QParallelAnimationGroup, QUrl
+from PyQt5.QtNetwork import QNetworkRequest, QNetworkAccessManager, QNetworkReply, QNetworkInterface, QAbstractSocket
+from PyQt5.QtGui import (
+    QDesktopServices, QPainter, QColor, QBrush, QFont, QMovie, QPixmap, QPalette, QStaticText, QKeySequence,
+    QImageReader
+)
+from PyQt5.QtCore import (
+    Qt, QTimer, QRect, QEasingCurve, QPropertyAnimation, QParallelAnimationGroup, QUrl, QObject, QEvent,
+    QBuffer, QIODevice, pyqtSignal
+)
+from collections import OrderedDict
 from functools import partial
 import weakref
+from XMaiDrawEngine import DrawHistory, draw_song, build_candidates, read_partial_list
+from XMaiBroadcast import BroadcastServer, song_payload
+from XMaiCovers import DEFAULT_COVER_SOURCE, cover_url
+from XMaiProfiler import profiler
+from XMaiCatalog import CatalogStore
+from XMaiSession import DEFAULT_SESSION_PATH, load_session, save_session
+from MaiMaiDataJSON转换数据库 import LEVELS
 
 STYLE = {
     "primary": "#fcf7f7",
@@ -22,44 +39,177 @@ STYLE = {
     "radius": "12px"
 }
 
+NO_REPEAT_DEFAULT = 20  # 默认最近多少首内不重复
+SESSION_SAVE_DELAY_MS = 300  # 合并短时间内的多次状态变化，只写一次会话文件
+
+# 界面按窗口大小整体缩放：以最小窗口尺寸为 1 倍，全屏时按屏幕大小放大
+BASE_WINDOW_SIZE = (1200, 800)
+MAX_UI_SCALE = 2.5
+UI_SCALE_STEP = 0.05  # 缩放倍数按步长取整，拖动窗口边缘时不会频繁重排
+COVER_SIZE = 300  # 1 倍时的封面边长
+PIXMAP_BUDGET_MB = 64  # 解码后封面占用内存的默认上限
+
+
+def ui_scale_for(width, height):
+    scale = min(width / BASE_WINDOW_SIZE[0], height / BASE_WINDOW_SIZE[1])
+    scale = min(max(scale, 1.0), MAX_UI_SCALE)
+    return round(scale / UI_SCALE_STEP) * UI_SCALE_STEP
+
+
+def session_value(state, key, default, valid):
+    """
+    读取会话中的一项，类型或取值不合法时使用默认值。
+    """
+    value = state.get(key, default)
+    try:
+        return value if valid(value) else default
+    except TypeError:
+        return default
+
+# 全部控件共用一份样式表，只在窗口创建时解析一次；控件通过 objectName 匹配规则
+APP_STYLESHEET = f"""
+    QWidget {{
+        background-color: {STYLE['background']};
+    }}
+    #titleBar, #titleBar QLabel, #titleBar QPushButton {{
+        background-color: {STYLE['primary']};
+    }}
+    #titleBar {{
+        border-top-left-radius: {STYLE['radius']};
+        border-top-right-radius: {STYLE['radius']};
+    }}
+    #titleLabel {{
+        color: {STYLE['text']};
+        font-size: 16px;
+        font-weight: 500;
+    }}
+    #titleBar QPushButton {{
+        color: {STYLE['text']};
+        border: none;
+        min-width: 30px;
+        min-height: 30px;
+        border-radius: 8px;
+    }}
+    #titleBar QPushButton:hover {{
+        background-color: {STYLE['secondary']};
+    }}
+    #modernLabel, #songLabel {{
+        color: {STYLE['text']};
+        font-size: 14px;
+    }}
+    #modernLabel {{
+        padding: 8px 0;
+    }}
+    #navFrame {{
+        background-color: {STYLE['secondary']};
+        border-radius: {STYLE['radius']};
+    }}
+    #navButton {{
+        color: {STYLE['text']};
+        font-size: 14px;
+        background-color: {STYLE['accent']};
+        border-radius: 8px;
+        padding: 8px;
+    }}
+    #navButton:hover, #accentButton:hover, #toolButton:hover, #githubButton:hover {{
+        background-color: #0095cc;
+    }}
+    #navButton:pressed {{
+        background-color: #007bb5;
+    }}
+    #accentButton {{
+        background-color: {STYLE['accent']};
+        color: {STYLE['primary']};
+        border-radius: {STYLE['radius']};
+        font-size: 14px;
+        font-weight: bold;
+    }}
+    #toolButton {{
+        background-color: {STYLE['accent']};
+        color: {STYLE['primary']};
+        border-radius: 8px;
+        padding: 8px 12px;
+        font-size: 14px;
+    }}
+    #githubButton {{
+        background-color: {STYLE['accent']};
+        color: {STYLE['primary']};
+        border-radius: 8px;
+        font-size: 18px;
+        font-weight: bold;
+    }}
+    QStackedWidget#pageStack {{
+        background-color: {STYLE['primary']};
+        border-radius: {STYLE['radius']};
+    }}
+    #resultLabel {{
+        background-color: {STYLE['secondary']};
+        border-radius: {STYLE['radius']};
+        padding: 20px;
+    }}
+    #coverView, #songCover {{
+        background-color: {STYLE['secondary']};
+        border-radius: {STYLE['radius']};
+    }}
+    QTextEdit#infoText {{
+        background-color: {STYLE['secondary']};
+        color: {STYLE['text']};
+        border: 2px solid {STYLE['accent']};
+        border-radius: {STYLE['radius']};
+        padding: 15px;
+    }}
+    #settingsPage QLabel {{
+        color: {STYLE['text']};
+        font-size: 14px;
+        padding: 8px 0;
+    }}
+    #settingsPage QComboBox, #settingsPage QLineEdit, #settingsPage QSpinBox {{
+        background-color: {STYLE['secondary']};
+        color: {STYLE['text']};
+        border: 2px solid {STYLE['accent']};
+        border-radius: 8px;
+        padding: 8px;
+        min-height: 40px;
+    }}
+    #settingsPage QLabel#copyrightLabel {{
+        font-size: 18px;
+        padding: 0;
+        margin-top: 18px;
+    }}
+    QLineEdit#searchBox, QListWidget#selectedSongsList {{
+        background-color: {STYLE['secondary']};
+        color: {STYLE['text']};
+        border: 2px solid {STYLE['accent']};
+        border-radius: 8px;
+        padding: 8px;
+        font-size: 14px;
+    }}
+    #perfOverlay {{
+        background-color: rgba(0, 0, 0, 160);
+        color: #7CFC00;
+        font-family: Consolas, monospace;
+        font-size: 12px;
+        padding: 8px;
+        border-radius: 6px;
+    }}
+"""
+
 class CustomTitleBar(QWidget):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
         self.setFixedHeight(40)
-        self.setStyleSheet(f"""
-            background-color: {STYLE['primary']};
-            border-top-left-radius: {STYLE['radius']};
-            border-top-right-radius: {STYLE['radius']};
-        """)
+        self.setObjectName("titleBar")
+        self.setAttribute(Qt.WA_StyledBackground)
         
         layout = QHBoxLayout(self)
         layout.setContentsMargins(15, 0, 15, 0)
         
         self.title = QLabel("MaiMaiDX - 比赛歌曲抽选器")
-        self.title.setStyleSheet(f"""
-            color: {STYLE['text']};
-            font-size: 16px;
-            font-weight: 500;
-        """)
-        
-        btn_style = f"""
-            QPushButton {{
-                color: {STYLE['text']};
-                border: none;
-                min-width: 30px;
-                min-height: 30px;
-                border-radius: 8px;
-            }}
-            QPushButton:hover {{
-                background-color: {STYLE['secondary']};
-            }}
-        """
+        self.title.setObjectName("titleLabel")
         
         self.min_btn = QPushButton("—")
         self.close_btn = QPushButton("×")
-        for btn in [self.min_btn, self.close_btn]:
-            btn.setStyleSheet(btn_style)
         
         self.min_btn.clicked.connect(self.parent.showMinimized)
         self.close_btn.clicked.connect(self.parent.close)
@@ -72,11 +222,7 @@ class CustomTitleBar(QWidget):
 class ModernLabel(QLabel):
     def __init__(self, text=""):
         super().__init__(text)
-        self.setStyleSheet(f"""
-            color: {STYLE['text']};
-            font-size: 14px;
-            padding: 8px 0;
-        """)
+        self.setObjectName("modernLabel")
 
 class DynamicBackground(QWidget):
     def __init__(self, parent=None):
@@ -84,8 +230,16 @@ class DynamicBackground(QWidget):
         self.bubbles = []
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_bubbles)
-        self.timer.start(30)
+
+    def start(self):
+        """
+        首帧显示之后再生成气泡、加模糊效果并启动动画。
+        """
+        blur_effect = QGraphicsBlurEffect()
+        blur_effect.setBlurRadius(10)
+        self.setGraphicsEffect(blur_effect)
         self.init_bubbles()
+        self.timer.start(30)
 
     def init_bubbles(self):
         for _ in range(50):
@@ -119,28 +273,436 @@ class DynamicBackground(QWidget):
             self.bubbles[i] = (x, y, radius, speed_x, speed_y, color)
         self.update()
 
+class FlashTicker(QWidget):
+    """
+    抽选前的快速闪现区域：自绘文字，不触发父布局重新排版。
+    每首歌的文字只排版一次并缓存为 QStaticText，按预先打乱的候选序列逐帧切换。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedHeight(120)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.text_font = QFont()
+        self.text_font.setPixelSize(24)
+        self.scale = 1.0
+        self.background = QColor(STYLE['background'])
+        self.text_color = QColor(STYLE['text'])
+        self.text_cache = {}  # 闪现文字 -> QStaticText，只保存当前序列用到的
+        self.sequence = []
+        self.position = 0
+        self.current = None
+
+    def set_scale(self, scale):
+        if scale == self.scale:
+            return
+        self.scale = scale
+        self.setFixedHeight(round(120 * scale))
+        self.text_font.setPixelSize(round(24 * scale))
+        self.text_cache.clear()  # 字号变化后重新排版
+        for item in self.sequence:
+            self.static_text(item)
+        self.update()
+
+    @staticmethod
+    def flash_text(item):
+        return f"快速闪现：{item['基础信息']['歌名']} ({item['派生']['等级文本']})"
+
+    def static_text(self, item):
+        # 不同数据库中同一 MusicID 的等级文本可能不同，直接以显示文字为键
+        key = self.flash_text(item)
+        text = self.text_cache.get(key)
+        if text is None:
+            text = QStaticText(key)
+            text.setTextFormat(Qt.PlainText)
+            text.setPerformanceHint(QStaticText.AggressiveCaching)
+            text.prepare(font=self.text_font)
+            self.text_cache[key] = text
+        return text
+
+    def start(self, pool, frames=100):
+        """
+        从真实候选池中预先打乱出本轮要闪现的序列，并提前完成排版。
+        """
+        if len(pool) >= frames:
+            self.sequence = random.sample(pool, frames)
+        else:
+            self.sequence = list(pool)
+            random.shuffle(self.sequence)
+        # 只保留本轮序列的排版结果，上一轮已排版的文字可以直接复用
+        previous, self.text_cache = self.text_cache, {}
+        for item in self.sequence:
+            key = self.flash_text(item)
+            if key in previous:
+                self.text_cache[key] = previous[key]
+            else:
+                self.static_text(item)
+        self.position = 0
+
+    def advance(self):
+        """
+        切换到序列中的下一首并返回该曲目。
+        """
+        if not self.sequence:
+            return None
+        item = self.sequence[self.position % len(self.sequence)]
+        self.position += 1
+        self.current = self.static_text(item)
+        self.update()
+        return item
+
+    def clear(self):
+        self.sequence = []
+        self.current = None
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.background)
+        if self.current is not None:
+            painter.setFont(self.text_font)
+            painter.setPen(self.text_color)
+            size = self.current.size()
+            painter.drawStaticText(
+                int((self.width() - size.width()) / 2),
+                int((self.height() - size.height()) / 2),
+                self.current
+            )
+
+class PerfOverlay(QLabel):
+    """
+    性能浮层（F3 开关）：帧率、最近操作耗时、进行中的网络请求与封面缓存命中率。
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setTextFormat(Qt.PlainText)
+        self.setObjectName("perfOverlay")
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def toggle(self):
+        enabled = not profiler.enabled
+        profiler.set_enabled(enabled)
+        self.setVisible(enabled)
+        if enabled:
+            self.refresh()
+            self.timer.start(500)
+        else:
+            self.timer.stop()
+
+    def refresh(self):
+        lines = [
+            f"FPS {profiler.fps():5.1f}  帧间隔p95 {profiler.frame_time_p95():6.1f} ms",
+            f"网络请求中 {profiler.counters.get('net.inflight', 0)}  "
+            f"封面命中率 {profiler.hit_rate('cover') * 100:5.1f}%",
+            f"封面内存 {profiler.counters.get('pixmap.bytes', 0) / 1024 / 1024:6.1f} / "
+            f"{profiler.marks.get('pixmap.budget_mb', 0)} MB  "
+            f"解码命中率 {profiler.hit_rate('pixmap') * 100:5.1f}%",
+        ]
+        if "startup.first_frame_ms" in profiler.marks:
+            lines.append(f"启动首帧 {profiler.marks['startup.first_frame_ms']:.0f} ms  "
+                         f"就绪 {profiler.marks.get('startup.ready_ms', 0):.0f} ms")
+        for name, stats in sorted(profiler.snapshot().items()):
+            lines.append(f"{name:<14} 最近 {stats['last_ms']:8.2f}  p50 {stats['p50_ms']:8.2f}  "
+                         f"p95 {stats['p95_ms']:8.2f} ms  ({stats['count']})")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.move(self.parent().width() - self.width() - 10, 50)
+        self.raise_()
+
+class CoverCache(QObject):
+    """
+    封面缓存：保存每张封面的内容与 ETag / Last-Modified。
+    过期的缓存照常立即返回，同时在后台发送条件请求重新验证（stale-while-revalidate）。
+    """
+
+    stored = pyqtSignal(str)  # 某个地址存入了新下载的内容
+
+    def __init__(self, net_manager, max_age=3600, max_bytes=64 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.net_manager = net_manager
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()  # url -> {"body", "etag", "last_modified", "expires"}
+        self.pending = {}  # url -> 等待该地址下载完成的回调列表
+        self.replies = set()  # 进行中的请求
+        self.revalidating = set()
+
+    def fetch(self, url, callback):
+        """
+        获取封面内容，callback(data) 收到 QByteArray，失败时收到 None。
+        """
+        entry = self.entries.get(url)
+        if entry is not None:
+            profiler.count("cover.hit")
+            self.entries.move_to_end(url)
+            callback(entry["body"])
+            if time.monotonic() >= entry["expires"] and url not in self.revalidating:
+                self.revalidating.add(url)
+                self._request(url, entry)
+            return
+
+        profiler.count("cover.miss")
+        if url in self.pending:
+            self.pending[url].append(callback)
+            return
+        self.pending[url] = [callback]
+        self._request(url, None)
+
+    def _request(self, url, entry):
+        request = QNetworkRequest(QUrl(url))
+        if entry is not None:
+            if entry["etag"]:
+                request.setRawHeader(b"If-None-Match", entry["etag"])
+            if entry["last_modified"]:
+                request.setRawHeader(b"If-Modified-Since", entry["last_modified"])
+        reply = self.net_manager.get(request)
+        profiler.count("net.inflight")
+        # 槽函数引用了 reply，两者只被 C++ 对象持有时会被 Python 当作循环垃圾回收，
+        # 连接随之断开、finished 永远不会到达，因此在完成前一直保留引用
+        self.replies.add(reply)
+        reply.finished.connect(partial(self._handle_reply, url=url, reply=reply, start=profiler.now()))
+
+    def _handle_reply(self, url, reply, start):
+        self.replies.discard(reply)
+        profiler.count("net.inflight", -1)
+        profiler.record("image.fetch", start)
+        status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+        entry = self.entries.get(url)
+        callbacks = self.pending.pop(url, [])
+        self.revalidating.discard(url)
+
+        if reply.error() != QNetworkReply.NoError:
+            # 重新验证失败时继续使用旧内容，下次访问再试
+            for callback in callbacks:
+                callback(None)
+        elif status == 304:
+            if entry is not None:
+                entry["expires"] = time.monotonic() + self._max_age(reply)
+            for callback in callbacks:
+                callback(entry["body"] if entry is not None else None)
+        else:
+            body = reply.readAll()
+            self._store(url, {
+                "body": body,
+                "etag": bytes(reply.rawHeader(b"ETag")),
+                "last_modified": bytes(reply.rawHeader(b"Last-Modified")),
+                "expires": time.monotonic() + self._max_age(reply),
+            })
+            for callback in callbacks:
+                callback(body)
+        reply.deleteLater()
+
+    def _max_age(self, reply):
+        match = re.search(rb"max-age=(\d+)", bytes(reply.rawHeader(b"Cache-Control")))
+        return int(match.group(1)) if match else self.max_age
+
+    def _store(self, url, entry):
+        old = self.entries.pop(url, None)
+        if old is not None:
+            self.total_bytes -= old["body"].size()
+        self.entries[url] = entry
+        self.total_bytes += entry["body"].size()
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted["body"].size()
+        # 重新验证或被淘汰后重新下载的内容可能与已解码的旧封面不同
+        self.stored.emit(url)
+
+
+class PixmapPool:
+    """
+    抽选页与查找页共用的已解码封面池：按 (封面地址, 边长, 像素比) 保存缩放好的 QPixmap，
+    总大小超过上限时淘汰最久未使用的条目。
+    查找页的封面控件只持有池中的图片，条目被淘汰时一并清空，因此上限就是封面实际占用的内存。
+    抽选页正在显示的封面同样计入上限，但不会被淘汰。
+    """
+
+    def __init__(self, budget_mb=PIXMAP_BUDGET_MB):
+        self.entries = OrderedDict()  # key -> QPixmap
+        self.keys = {}  # 封面地址 -> 该封面的全部 key
+        self.users = {}  # key -> 显示该图片的 CoverLabel 弱引用
+        self.pinned = None  # 抽选页正在显示的封面，计入上限但不参与淘汰
+        self.used_bytes = 0
+        self.set_budget(budget_mb)
+
+    def set_budget(self, budget_mb):
+        self.budget_mb = budget_mb
+        profiler.mark("pixmap.budget_mb", budget_mb)
+        self._evict()
+
+    def get(self, url, data, size, ratio=1.0, pin=False):
+        """
+        返回边长不超过 size（逻辑像素）的封面；data 为 CoverCache 返回的原始图片内容。
+        """
+        key = (url, size, ratio)
+        if pin:
+            self.pinned = key
+        pixmap = self.entries.get(key)
+        if pixmap is not None:
+            profiler.count("pixmap.hit")
+            self.entries.move_to_end(key)
+            return pixmap
+
+        profiler.count("pixmap.miss")
+        with profiler.span("image.decode"):
+            pixmap = self.decode(data, round(size * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        self.entries[key] = pixmap
+        self.keys.setdefault(url, set()).add(key)
+        self._add_bytes(self.pixmap_bytes(pixmap))
+        self._evict()
+        return pixmap
+
+    def show(self, label, url, data, size, ratio=1.0):
+        """
+        在查找页的封面控件上显示封面，并记录下来以便淘汰时清空。
+        """
+        pixmap = self.get(url, data, size, ratio)
+        key = (url, size, ratio)
+        if key not in self.entries:
+            # 抽选页的封面已占满上限，刚解码的图片随即被淘汰；不显示，避免占用上限之外的内存
+            return
+        label.setPixmap(pixmap)
+        users = [ref for ref in self.users.get(key, ()) if ref() is not None]
+        users.append(weakref.ref(label))
+        self.users[key] = users
+
+    def invalidate(self, url):
+        """
+        封面内容更新后丢弃该地址已解码的全部尺寸。
+        """
+        for key in self.keys.pop(url, ()):
+            self._remove(key)
+
+    def decode(self, data, pixels):
+        # 直接解码到目标尺寸，不在内存中保留原尺寸的图片
+        buffer = QBuffer()
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+        source = reader.size()
+        if source.isValid():
+            reader.setScaledSize(source.scaled(pixels, pixels, Qt.KeepAspectRatio))
+        return QPixmap.fromImage(reader.read())
+
+    def pixmap_bytes(self, pixmap):
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def _add_bytes(self, delta):
+        self.used_bytes += delta
+        profiler.count("pixmap.bytes", delta)
+
+    def _evict(self):
+        # 至少保留刚放入的一张，避免单张封面超过上限时反复解码
+        while self.used_bytes > self.budget_mb * 1024 * 1024 and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            if key == self.pinned:
+                self.entries.move_to_end(key)
+                continue
+            keys = self.keys.get(key[0])
+            keys.discard(key)
+            if not keys:
+                del self.keys[key[0]]
+            self._remove(key)
+
+    def _remove(self, key):
+        pixmap = self.entries.pop(key)
+        self._add_bytes(-self.pixmap_bytes(pixmap))
+        # 控件不再持有被淘汰的图片，重新可见时再从池中取
+        for ref in self.users.pop(key, ()):
+            label = ref()
+            if label is not None:
+                label.release_cover(pixmap)
+
+
+class CoverLabel(QLabel):
+    """
+    查找页的封面：第一次绘制（即滚动到可见区域）时才加载，封面被 PixmapPool 淘汰后再次可见时重新加载。
+    load(weak_label) 负责取得封面并调用 PixmapPool.show。
+    """
+
+    def __init__(self, load, parent=None):
+        super().__init__(parent)
+        self.load = load
+        self.requested = False
+
+    def release_cover(self, pixmap):
+        current = self.pixmap()
+        if current is not None and current.cacheKey() == pixmap.cacheKey():
+            self.clear()
+            self.requested = False
+            self.update()
+
+    def paintEvent(self, event):
+        if not self.requested:
+            self.requested = True
+            # 绘制结束后再加载，不在 paintEvent 中修改控件
+            QTimer.singleShot(0, partial(self.load, weakref.ref(self)))
+        super().paintEvent(event)
+
+
 class MaimaiDraw(QMainWindow):
     def __init__(self):
         super().__init__(flags=Qt.FramelessWindowHint)
+        # 先设置整份样式表，后面创建的控件只需匹配一次
+        self.setStyleSheet(APP_STYLESHEET)
+        self.startup_report = {"import_ms": (time.perf_counter() - STARTUP_TIME) * 1000}
+        self.first_frame_shown = False
         self.init_ui()
-        self.data = []
+        self.data = []  # 当前数据库按等级过滤后的曲目
+        self.catalogs = CatalogStore()  # 所有已加载的数据库，共享字符串与曲目对象
         self.current_result = None
         self.net_manager = QNetworkAccessManager()
+        self.cover_cache = CoverCache(self.net_manager, parent=self)
+        self.cover_cache.stored.connect(self.cover_updated)
         self.partial_list = []
+        self.partial_list_path = None
         self.anim_group = None
         self.flash_timer = None
-        self.flash_index = 0
         self.old_pos = None
         self.animation_labels = []
         self.is_fullscreen = False
-        self.fullscreen_factor = 1.5
+        self.ui_scale = 1.0
+        self.cover_data = None  # 当前结果封面的原始图片内容
+        self.cover_name = None
+        self.cover_url = None
+        self.pixmap_pool = PixmapPool()  # 抽选页与查找页共用的已解码封面
         self.nav_visible = True
         self.selected_songs = set()  # 用于存储勾选的歌曲 MusicID
         self.filtered_data = []  # 用于存储当前筛选出的数据
         self.selected_songs_list = {}  # 用于存储选中的歌曲及其对应的 QLabel 和 QCheckBox
+        self.random_mode = 0  # 0 为全部随机，1 为部分随机
+        self.level = "全部等级"  # 当前等级筛选，设置页创建前也要能读取
+        try:
+            self.history = DrawHistory(window=NO_REPEAT_DEFAULT)  # 抽选历史记录
+        except (OSError, ValueError) as e:
+            # 历史记录文件损坏或目录不可写时只在内存中记录，保证软件能正常启动
+            self.history = DrawHistory(path=None, window=NO_REPEAT_DEFAULT)
+            self.status_label.setText(f"抽选历史记录无法打开，本次仅在内存中记录：{e}")
+        self.broadcast = BroadcastServer()  # 局域网观众端广播
+        self.cover_source = DEFAULT_COVER_SOURCE  # 封面来源：远程地址、局域网镜像或本地目录
+        self.session_path = DEFAULT_SESSION_PATH
+        self.session_save_failed = False  # 保存失败只提示一次
+        self.session_timer = QTimer(self)
+        self.session_timer.setSingleShot(True)
+        self.session_timer.setInterval(SESSION_SAVE_DELAY_MS)
+        self.session_timer.timeout.connect(self.save_session_now)
 
         self.setMinimumSize(1200, 800)
-        self.setStyleSheet(f"background-color: {STYLE['background']};")
+
+        # 性能统计：F3 显示/隐藏浮层，F4 导出 trace 文件
+        self.perf_overlay = PerfOverlay(self)
+        if profiler.enabled:
+            profiler.set_enabled(False)
+            self.perf_overlay.toggle()
+        QShortcut(QKeySequence("F3"), self, activated=self.perf_overlay.toggle)
+        QShortcut(QKeySequence("F4"), self, activated=self.export_trace)
+        self.startup_report["window_ms"] = (time.perf_counter() - STARTUP_TIME) * 1000
 
     def init_ui(self):
         main_widget = QWidget()
@@ -149,11 +711,8 @@ class MaimaiDraw(QMainWindow):
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.setSpacing(0)
         
-        # 动态背景
+        # 动态背景（首帧之后才启动）
         self.dynamic_background = DynamicBackground(self)
-        blur_effect = QGraphicsBlurEffect()
-        blur_effect.setBlurRadius(10)
-        self.dynamic_background.setGraphicsEffect(blur_effect)
         main_layout.addWidget(self.dynamic_background)
         
         self.title_bar = CustomTitleBar(self)
@@ -167,10 +726,7 @@ class MaimaiDraw(QMainWindow):
         # 导航栏
         self.nav_frame = QFrame()
         self.nav_frame.setFixedWidth(200)
-        self.nav_frame.setStyleSheet(f"""
-            background-color: {STYLE['secondary']};
-            border-radius: {STYLE['radius']};
-        """)
+        self.nav_frame.setObjectName("navFrame")
         nav_layout = QVBoxLayout(self.nav_frame)
         nav_layout.setContentsMargins(10, 20, 10, 20)
         nav_layout.setSpacing(15)
@@ -185,34 +741,20 @@ class MaimaiDraw(QMainWindow):
         
         self.fullscreen_btn = QPushButton("全屏化")
         self.fullscreen_btn.setFixedHeight(50)
-        self.fullscreen_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {STYLE['accent']};
-                color: {STYLE['primary']};
-                border-radius: {STYLE['radius']};
-                font-size: 14px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: #0095cc;
-            }}
-        """)
+        self.fullscreen_btn.setObjectName("accentButton")
         self.fullscreen_btn.clicked.connect(self.toggle_fullscreen)
         nav_layout.addWidget(self.fullscreen_btn)
 
         content_layout.addWidget(self.nav_frame)
         
         self.stack = QStackedWidget()
-        self.stack.setStyleSheet(f"""
-            QStackedWidget {{
-                background-color: {STYLE['primary']};
-                border-radius: {STYLE['radius']};
-            }}
-        """)
+        self.stack.setObjectName("pageStack")
         
-        self.init_draw_page()
-        self.init_settings_page()
-        self.init_search_page()
+        # 设置页和查找页在第一次切换过去时才创建，先用空白页占位
+        self.stack.addWidget(self.init_draw_page())
+        self.lazy_pages = {1: self.init_settings_page, 2: self.init_search_page}
+        for _ in self.lazy_pages:
+            self.stack.addWidget(QWidget())
         
         content_layout.addWidget(self.stack, 1)
         main_layout.addWidget(content_widget)
@@ -225,23 +767,22 @@ class MaimaiDraw(QMainWindow):
     def create_nav_button(self, text):
         btn = QPushButton(text)
         btn.setFixedHeight(50)
-        btn.setStyleSheet(f"""
-            QPushButton {{
-                color: {STYLE['text']};
-                font-size: 14px;
-                background-color: {STYLE['accent']};
-                border-radius: 8px;
-                padding: 8px;
-            }}
-            QPushButton:hover {{
-                background-color: #0095cc;
-            }}
-            QPushButton:pressed {{
-                background-color: #007bb5;
-            }}
-        """)
+        btn.setObjectName("navButton")
         return btn
 
+    def ensure_page(self, index):
+        """
+        创建尚未构建的页面并替换占位页。
+        """
+        builder = self.lazy_pages.pop(index, None)
+        if builder is None:
+            return
+        with profiler.span("page.build"):
+            placeholder = self.stack.widget(index)
+            self.stack.insertWidget(index, builder())
+            self.stack.removeWidget(placeholder)
+            placeholder.deleteLater()
+
     def init_draw_page(self):
         page = QWidget()
         layout = QVBoxLayout(page)
@@ -250,17 +791,11 @@ class MaimaiDraw(QMainWindow):
         
         self.result_label = ModernLabel("点击下方按钮开始抽选喵 OvO")
         self.result_label.setAlignment(Qt.AlignCenter)
-        self.result_label.setStyleSheet(f"""
-            font-size: 24px;
-            background-color: {STYLE['secondary']};
-            border-radius: {STYLE['radius']};
-            padding: 20px;
-        """)
+        self.result_label.setObjectName("resultLabel")
+        self.set_pixel_size(self.result_label, 24)
         
         # 动画区域
-        self.animation_area = QWidget()
-        self.animation_area.setFixedHeight(120)
-        self.animation_area.setStyleSheet(f"background-color: {STYLE['background']};")
+        self.animation_area = FlashTicker()
         
         # 信息展示区
         info_widget = QWidget()
@@ -271,26 +806,21 @@ class MaimaiDraw(QMainWindow):
         self.image_view = QGraphicsView()
         self.image_scene = QGraphicsScene()
         self.image_view.setScene(self.image_scene)
-        self.image_view.setFixedSize(300, 300)
+        # 封面与失败提示各用一个常驻图元，每次抽选只替换内容
+        self.cover_item = self.image_scene.addPixmap(QPixmap())
+        self.cover_error = self.image_scene.addText("图片加载失败", QFont("Arial", 12))
+        self.cover_error.hide()
+        self.image_view.setFixedSize(COVER_SIZE, COVER_SIZE)
+        self.image_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.image_view.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.image_view.setAlignment(Qt.AlignCenter)
-        self.image_view.setStyleSheet(f"""
-            background-color: {STYLE['secondary']};
-            border-radius: {STYLE['radius']};
-        """)
+        self.image_view.setObjectName("coverView")
         
         # 详细信息
         self.info_text = QTextEdit()
         self.info_text.setReadOnly(True)
-        self.info_text.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {STYLE['secondary']};
-                color: {STYLE['text']};
-                border: 2px solid {STYLE['accent']};
-                border-radius: {STYLE['radius']};
-                padding: 15px;
-                font-size: 26px; /* 增加字体大小 */
-            }}
-        """)
+        self.info_text.setObjectName("infoText")
+        self.set_pixel_size(self.info_text, 26)
         
         info_layout.addWidget(self.image_view)
         info_layout.addWidget(self.info_text)
@@ -298,34 +828,18 @@ class MaimaiDraw(QMainWindow):
         # 开始按钮
         self.start_btn = QPushButton("✨ 开始抽选")
         self.start_btn.setFixedHeight(50)
-        self.start_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {STYLE['accent']};
-                color: {STYLE['primary']};
-                border-radius: {STYLE['radius']};
-                font-size: 14px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: #0095cc;
-            }}
-        """)
+        self.start_btn.setObjectName("accentButton")
         self.start_btn.clicked.connect(self.start_animation)
         
         # 加载状态标签
-        self.status_label = QLabel("")
-        self.status_label.setStyleSheet(f"""
-            color: {STYLE['text']};
-            font-size: 14px;
-            padding: 8px 0;
-        """)
+        self.status_label = ModernLabel("")
         
         layout.addWidget(self.result_label)
         layout.addWidget(self.animation_area)
         layout.addWidget(info_widget, 1)
         layout.addWidget(self.start_btn)
         layout.addWidget(self.status_label)
-        self.stack.addWidget(page)
+        return page
 
     def init_settings_page(self):
         page = QWidget()
@@ -336,78 +850,74 @@ class MaimaiDraw(QMainWindow):
         # 设置项样式
         form_layout = QFormLayout()
         form_layout.setVerticalSpacing(15)
-        
-        page.setStyleSheet(f"""
-            QLabel {{
-                color: {STYLE['text']};
-                font-size: 14px;
-                padding: 8px 0;
-            }}
-            QComboBox, QLineEdit {{
-                background-color: {STYLE['secondary']};
-                color: {STYLE['text']};
-                border: 2px solid {STYLE['accent']};
-                border-radius: 8px;
-                padding: 8px;
-                min-height: 40px;
-            }}
-        """)
+        page.setObjectName("settingsPage")
         
         # 文件选择按钮
         self.json_btn = self.create_tool_button("📁 选择曲目数据库")
         self.json_path = ModernLabel("未选择")
+        self.db_combo = QComboBox()
+        for catalog in self.catalogs.catalogs.values():
+            self.db_combo.addItem(catalog.name, catalog.path)
+        if self.catalogs.active is not None:
+            self.db_combo.setCurrentIndex(self.db_combo.findData(self.catalogs.active.path))
+            self.json_path.setText(self.catalogs.active.name)
         self.txt_btn = self.create_tool_button("📝 选择要进行随机的表单")
-        self.txt_path = ModernLabel("未选择")
+        self.txt_path = ModernLabel(os.path.basename(self.partial_list_path) if self.partial_list_path else "未选择")
+        self.txt_btn.setEnabled(self.random_mode == 1)
+        self.txt_path.setEnabled(self.random_mode == 1)
         
         # 下拉菜单
         self.mode_combo = QComboBox()
         self.mode_combo.addItems(["全部随机", "部分随机"])
+        self.mode_combo.setCurrentIndex(self.random_mode)
         self.level_combo = QComboBox()
-        levels = [
-            "全部等级",
-            "1", "2", "3", "4", "5", "6", "7", "7+", "8", "8+", "9", "9+", "10", "10+", 
-            "11", "11+", "12", "12+", "13", "13+", "14", "14+", "15"
-        ]
-        self.level_combo.addItems(levels)
+        self.level_combo.addItems(["全部等级", *LEVELS])
+        self.level_combo.setCurrentText(self.level)
+        self.no_repeat_spin = QSpinBox()
+        self.no_repeat_spin.setRange(0, 500)
+        self.no_repeat_spin.setValue(self.history.window)
+        self.no_repeat_spin.setSuffix(" 首内不重复")
+        self.pixmap_budget_spin = QSpinBox()
+        self.pixmap_budget_spin.setRange(8, 2048)
+        self.pixmap_budget_spin.setValue(self.pixmap_pool.budget_mb)
+        self.pixmap_budget_spin.setSuffix(" MB")
+        self.broadcast_check = QCheckBox("向局域网观众端推送抽选过程")
+        self.cover_source_edit = QLineEdit(self.cover_source)
+        self.cover_source_edit.setPlaceholderText("封面地址、局域网镜像地址或本地目录")
+        self.cover_dir_btn = self.create_tool_button("📂 选择本地封面目录")
         
         # 统一控件高度
         self.json_btn.setMinimumHeight(40)
         self.txt_btn.setMinimumHeight(40)
         self.mode_combo.setMinimumHeight(40)
         self.level_combo.setMinimumHeight(40)
+        self.db_combo.setMinimumHeight(40)
+        self.no_repeat_spin.setMinimumHeight(40)
+        self.pixmap_budget_spin.setMinimumHeight(40)
+        self.cover_dir_btn.setMinimumHeight(40)
         
         # 表单布局
         form_layout.addRow(ModernLabel("数据库文件:"), self.json_btn)
         form_layout.addRow(ModernLabel("当前路径:"), self.json_path)
+        form_layout.addRow(ModernLabel("已加载数据库:"), self.db_combo)
         form_layout.addRow(ModernLabel("随机模式:"), self.mode_combo)
         form_layout.addRow(ModernLabel("等级选择:"), self.level_combo)
+        form_layout.addRow(ModernLabel("防止重复:"), self.no_repeat_spin)
+        form_layout.addRow(ModernLabel("封面内存上限:"), self.pixmap_budget_spin)
+        form_layout.addRow(ModernLabel("局域网广播:"), self.broadcast_check)
+        form_layout.addRow(ModernLabel("封面来源:"), self.cover_source_edit)
+        form_layout.addRow(ModernLabel(""), self.cover_dir_btn)
         form_layout.addRow(ModernLabel("部分列表:"), self.txt_btn)
         form_layout.addRow(ModernLabel("当前列表:"), self.txt_path)
         
         # 版权信息和 GitHub 按钮
         bottom_layout = QHBoxLayout()
         copyright_label = QLabel("@XMaoCAT 2025 | Debug&fix @Qwen-code-plus")
-        copyright_label.setStyleSheet(f"""
-            color: {STYLE['text']};
-            font-size: 18px;
-            align: center;
-            margin-top: 18px;
-        """)
+        copyright_label.setObjectName("copyrightLabel")
         
         self.github_btn = QPushButton("   🐱   ")
         self.github_btn.setFixedHeight(30)
-        self.github_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {STYLE['accent']};
-                color: {STYLE['primary']};
-                border-radius: 8px;
-                font-size: 18px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: #0095cc;
-            }}
-        """)
+        self.github_btn.setObjectName("githubButton")
         self.github_btn.clicked.connect(self.open_github)
         
         bottom_layout.addWidget(copyright_label)
@@ -422,9 +932,15 @@ class MaimaiDraw(QMainWindow):
         self.json_btn.clicked.connect(self.load_json)
         self.txt_btn.clicked.connect(self.load_txt)
         self.mode_combo.currentIndexChanged.connect(self.update_mode)
-        self.level_combo.currentIndexChanged.connect(self.filter_data)
+        self.level_combo.currentTextChanged.connect(self.update_level)
+        self.db_combo.activated.connect(self.switch_database)
+        self.no_repeat_spin.valueChanged.connect(self.update_no_repeat_window)
+        self.pixmap_budget_spin.valueChanged.connect(self.update_pixmap_budget)
+        self.broadcast_check.toggled.connect(self.toggle_broadcast)
+        self.cover_source_edit.editingFinished.connect(self.update_cover_source)
+        self.cover_dir_btn.clicked.connect(self.choose_cover_dir)
         
-        self.stack.addWidget(page)
+        return page
 
     def init_search_page(self):
         page = QWidget()
@@ -436,33 +952,13 @@ class MaimaiDraw(QMainWindow):
         search_layout = QHBoxLayout()
         self.search_box = QLineEdit()
         self.search_box.setPlaceholderText("输入歌曲名称、别名或 MusicID")
-        self.search_box.setStyleSheet(f"""
-            QLineEdit {{
-                background-color: {STYLE['secondary']};
-                color: {STYLE['text']};
-                border: 2px solid {STYLE['accent']};
-                border-radius: 8px;
-                padding: 8px;
-                font-size: 14px;
-            }}
-        """)
+        self.search_box.setObjectName("searchBox")
         self.search_box.textChanged.connect(self.search_songs)
         search_layout.addWidget(self.search_box)
         
         # 保存按钮
         self.save_btn = QPushButton("保存选中的歌曲")
-        self.save_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {STYLE['accent']};
-                color: {STYLE['primary']};
-                border-radius: {STYLE['radius']};
-                font-size: 14px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: #0095cc;
-            }}
-        """)
+        self.save_btn.setObjectName("accentButton")
         self.save_btn.clicked.connect(self.save_selected_songs)
         search_layout.addWidget(self.save_btn)
         
@@ -478,36 +974,25 @@ class MaimaiDraw(QMainWindow):
         
         # 选中歌曲列表
         self.selected_songs_list_widget = QListWidget()
-        self.selected_songs_list_widget.setStyleSheet(f"""
-            QListWidget {{
-                background-color: {STYLE['secondary']};
-                color: {STYLE['text']};
-                border: 2px solid {STYLE['accent']};
-                border-radius: 8px;
-                padding: 8px;
-                font-size: 14px;
-            }}
-        """)
+        self.selected_songs_list_widget.setObjectName("selectedSongsList")
         self.selected_songs_list_widget.itemClicked.connect(self.remove_from_selected_songs)
         layout.addWidget(self.selected_songs_list_widget)
         
-        self.stack.addWidget(page)
+        # 恢复会话中已勾选的曲目
+        if self.selected_songs and self.catalogs.active is not None:
+            songs = {item["基础信息"]["MusicID"]: item for item in self.catalogs.active.data}
+            for music_id in sorted(self.selected_songs):
+                if music_id in songs:
+                    list_item = QListWidgetItem(songs[music_id]["派生"]["列表名"])
+                    self.selected_songs_list[music_id] = list_item
+                    self.selected_songs_list_widget.addItem(list_item)
+        
+        return page
 
     def create_tool_button(self, text):
         btn = QPushButton(text)
         btn.setFixedHeight(40)
-        btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {STYLE['accent']};
-                color: {STYLE['primary']};
-                border-radius: 8px;
-                padding: 8px 12px;
-                font-size: 14px;
-            }}
-            QPushButton:hover {{
-                background-color: #0095cc;
-            }}
-        """)
+        btn.setObjectName("toolButton")
         return btn
 
     def load_json(self):
@@ -516,44 +1001,61 @@ class MaimaiDraw(QMainWindow):
         )
         if path:
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
-                self.json_path.setText(path.split('/')[-1])
+                with profiler.span("db.load"):
+                    catalog = self.catalogs.load(path)
+                if self.db_combo.findData(path) < 0:
+                    self.db_combo.addItem(catalog.name, path)
+                self.db_combo.setCurrentIndex(self.db_combo.findData(path))
+                self.json_path.setText(catalog.name)
                 self.filter_data()
+                self.schedule_session_save()
                 QMessageBox.information(self, "成功", "数据库加载成功！")
-                self.status_label.setText("数据库已加载")
-                print(f"Loaded data: {len(self.data)} items")  # 调试信息
+                self.status_label.setText(f"数据库已加载，共 {len(catalog.data)} 首")
+                for name, value in self.catalogs.stats().items():
+                    profiler.mark(f"db.{name}", value)
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"文件加载失败：{str(e)}")
-                self.data = []  # 确保数据清空
+                # 已加载的数据库不受影响，继续使用当前数据库
                 self.status_label.setText("数据库加载失败")
 
+    def switch_database(self, index):
+        """
+        切换到另一个已加载的数据库，等级过滤结果按数据库缓存，不需要重新加载。
+        """
+        path = self.db_combo.itemData(index)
+        if path is None or (self.catalogs.active is not None and self.catalogs.active.path == path):
+            return
+        catalog = self.catalogs.activate(path)
+        self.json_path.setText(catalog.name)
+        self.filter_data()
+        self.schedule_session_save()
+        if "search_box" in self.__dict__ and self.search_box.text():
+            self.search_songs()
+
     def load_txt(self):
         path, _ = QFileDialog.getOpenFileName(
             self, "选择TXT文件", "", "如果没有随机歌单请用[查找/制作]制作一份"
         )
         if path:
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    self.partial_list = [
-                        line.strip().split(',') for line in f if line.strip()
-                    ]
-                    self.partial_list = [item.strip() for sublist in self.partial_list for item in sublist]
+                self.partial_list = read_partial_list(path)
+                self.partial_list_path = path
                 self.txt_path.setText(path.split('/')[-1])
+                self.schedule_session_save()
                 print(f"Loaded partial list: {self.partial_list}")  # 调试信息
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"文件加载失败：{str(e)}")
 
+    def update_level(self, level):
+        self.level = level
+        self.filter_data()
+
     def filter_data(self):
-        selected_level = self.level_combo.currentText()
-        if selected_level == "全部等级":
-            filtered_data = self.data
-        else:
-            # 处理等级选项，支持 "7+"、"8+" 等形式
-            filtered_data = [
-                item for item in self.data
-                if selected_level in item["基础信息"]["等级"]
-            ]
+        selected_level = self.level
+        # 处理等级选项，支持 "7+"、"8+" 等形式；使用数据库中预先计算的等级掩码
+        catalog = self.catalogs.active
+        with profiler.span("db.filter"):
+            filtered_data = catalog.view(selected_level) if catalog is not None else []
         
         if not filtered_data:
             print("No data after filtering")  # 调试信息
@@ -563,12 +1065,52 @@ class MaimaiDraw(QMainWindow):
             return
         
         self.data = filtered_data
+        self.schedule_session_save()
         print(f"Filtered data: {len(self.data)} items")  # 调试信息
         self.status_label.setText(f"数据已过滤，共 {len(self.data)} 个项目")
 
+    def update_no_repeat_window(self, value):
+        self.history.set_window(value)
+        self.schedule_session_save()
+
+    def update_pixmap_budget(self, value):
+        self.pixmap_pool.set_budget(value)
+        self.schedule_session_save()
+
+    def update_cover_source(self):
+        self.cover_source = self.cover_source_edit.text().strip() or DEFAULT_COVER_SOURCE
+        self.cover_source_edit.setText(self.cover_source)
+        self.schedule_session_save()
+
+    def choose_cover_dir(self):
+        path = QFileDialog.getExistingDirectory(self, "选择本地封面目录")
+        if path:
+            self.cover_source_edit.setText(path)
+            self.update_cover_source()
+
+    def toggle_broadcast(self, enabled):
+        if not enabled:
+            self.broadcast.stop()
+            self.status_label.setText("局域网广播已关闭")
+            return
+        try:
+            self.broadcast.start()
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"广播服务器启动失败：{str(e)}")
+            self.broadcast_check.setChecked(False)
+            return
+        host = "127.0.0.1"
+        for address in QNetworkInterface.allAddresses():
+            if address.protocol() == QAbstractSocket.IPv4Protocol and not address.isLoopback():
+                host = address.toString()
+                break
+        self.status_label.setText(f"观众端请打开 http://{host}:{self.broadcast.port}/?spectator")
+
     def update_mode(self, index):
+        self.random_mode = index
         self.txt_btn.setEnabled(index == 1)
         self.txt_path.setEnabled(index == 1)
+        self.schedule_session_save()
 
     def start_animation(self):
         if not self.data:
@@ -586,13 +1128,20 @@ class MaimaiDraw(QMainWindow):
         # 启动倒计时和快速闪现动画
         self.countdown = 5
         self.start_btn.setText(str(self.countdown))
+        self.broadcast.publish({"type": "countdown", "value": self.countdown})
         self.start_btn.setEnabled(False)
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_countdown)
         self.timer.start(1000)
 
-        self.flash_index = 0
+        try:
+            pool = self.draw_candidates()
+            pool = self.history.exclude_recent(pool) or pool
+        except ValueError:
+            pool = []  # 抽选条件有误时在揭晓结果时报错
+        self.animation_area.start(pool)
         self.flash_timer = QTimer(self)
+        self.flash_timer.setTimerType(Qt.PreciseTimer)
         self.flash_timer.timeout.connect(self.flash_song_info)
         self.flash_timer.start(50)  # 初始速度较快
 
@@ -629,81 +1178,102 @@ class MaimaiDraw(QMainWindow):
         if self.countdown > 1:
             self.countdown -= 1
             self.start_btn.setText(str(self.countdown))
+            self.broadcast.publish({"type": "countdown", "value": self.countdown})
         else:
             self.timer.stop()
             self.start_btn.setText("✨ 开始抽选")
             self.start_btn.setEnabled(True)
             self.flash_timer.stop()
+            self.animation_area.clear()
             self.show_final_result()
 
     def flash_song_info(self):
-        if self.flash_index < len(self.data):
-            # 从当前索引附近随机选择一首歌
-            start_index = max(0, self.flash_index - 5)
-            end_index = min(len(self.data), self.flash_index + 5)
-            random_index = random.randint(start_index, end_index - 1)
-            song_info = self.data[random_index]["基础信息"]
-            self.result_label.setText(f"快速闪现：{song_info['歌名']} ({'/'.join(song_info['等级'])})")
-            self.flash_index += 1
+        item = self.animation_area.advance()
+        if item is not None:
+            self.broadcast.publish({"type": "flash", "song": song_payload(item)})
+
+    def draw_candidates(self):
+        return build_candidates(self.data, self.random_mode, self.partial_list)
 
     def show_final_result(self):
+        with profiler.span("draw.reveal"):
+            self.reveal_result()
+
+    def reveal_result(self):
         try:
-            if not self.data:
-                raise ValueError("数据库未加载")
-                
-            if self.mode_combo.currentIndex() == 1 and not self.partial_list:
-                raise ValueError("部分随机模式需要加载列表文件")
-
-            candidates = self.data if self.mode_combo.currentIndex() == 0 else [
-                x for x in self.data if x["基础信息"]["MusicID"] in self.partial_list
-            ]
-            
-            if not candidates:
-                raise ValueError("没有符合条件的曲目")
-            
-            self.current_result = random.choice(candidates)
+            candidates = self.draw_candidates()
+            self.current_result, fallback = draw_song(candidates, self.history)
             info = self.current_result["基础信息"]
-            
-            # 更新界面
-            self.result_label.setText(f"结果：{info['歌名']}")
-            self.info_text.setText(
+            self.history.record(info["MusicID"])
+            self.broadcast.publish({"type": "result", "song": song_payload(self.current_result)})
+            self.schedule_session_save()
+            self.show_result()
+            if fallback:
+                self.status_label.setText("候选曲目均在最近抽选记录中，本次允许重复")
+
+        except Exception as e:
+            QMessageBox.critical(self, "错误", str(e))
+
+    def show_result(self):
+        """
+        在抽选页显示 current_result 的曲目信息与封面。
+        """
+        info = self.current_result["基础信息"]
+        self.result_label.setText(f"结果：{info['歌名']}")
+        self.info_text.setText(
                 f"艺术家：{info.get('artist', '未知')}\n"
                 f"BPM：{info.get('bpm', '未知')}\n"
                 f"版本：{info.get('版本', '未知')}\n"
-                f"等级：{'/'.join(info['等级'])}\n"
-                f"定数：{'/'.join(map(str, info['定数']))}"
-            )
-            
-            if 'image_url' in info:
-                image_url = f"https://maimaidx.jp/maimai-mobile/img/Music/{info['image_url']}"
-                self.load_image(image_url)
-            else:
-                self.image_scene.clear()
+                f"等级：{self.current_result['派生']['等级文本']}\n"
+                f"定数：{self.current_result['派生']['定数文本']}"
+        )
+        
+        if 'image_url' in info:
+            image_url = cover_url(self.cover_source, info['image_url'])
+            self.load_image(image_url, info['image_url'])
+        else:
+            self.cover_data = None
+            self.cover_item.setPixmap(QPixmap())
+            self.cover_error.hide()
 
-        except Exception as e:
-            QMessageBox.critical(self, "错误", str(e))
+    def load_image(self, url, image_name=None):
+        self.cover_cache.fetch(url, partial(self.handle_image_load, url=url, image_name=image_name))
 
-    def load_image(self, url):
-        request = QNetworkRequest(QUrl(url))
-        reply = self.net_manager.get(request)
-        reply.finished.connect(partial(self.handle_image_load, reply=reply))
-
-    def handle_image_load(self, reply):
-        if reply.error() == QNetworkReply.NoError:
-            data = reply.readAll()
-            pixmap = QPixmap()
-            pixmap.loadFromData(data)
-            self.image_scene.clear()
-            if self.is_fullscreen:
-                self.image_view.setFixedSize(500, 500)
-            else:
-                self.image_view.setFixedSize(300, 300)
-            self.image_scene.addPixmap(pixmap)
-            self.image_view.fitInView(self.image_scene.sceneRect(), Qt.KeepAspectRatio)
+    def handle_image_load(self, data, url, image_name=None):
+        if data is not None:
+            if image_name:
+                # 转交给广播服务器，观众端从本机获取封面
+                self.broadcast.put_cover(image_name, data)
+                self.broadcast.publish({"type": "cover", "image_url": image_name})
+            self.cover_data = data
+            self.cover_name = image_name
+            self.cover_url = url
+            self.show_cover()
         else:
-            self.image_scene.clear()
-            self.image_scene.addText("图片加载失败", QFont("Arial", 12))
-        reply.deleteLater()
+            self.cover_data = None
+            self.cover_item.setPixmap(QPixmap())
+            self.cover_error.show()
+
+    def show_cover(self):
+        """
+        按当前封面区域大小显示封面，每种尺寸只解码缩放一次。
+        """
+        if self.cover_data is None:
+            return
+        size = self.image_view.width() - 2 * self.image_view.frameWidth()
+        ratio = self.devicePixelRatioF()
+        pixmap = self.pixmap_pool.get(self.cover_url, self.cover_data, size, ratio, pin=True)
+        self.cover_error.hide()
+        self.cover_item.setPixmap(pixmap)
+        self.image_scene.setSceneRect(0, 0, pixmap.width() / ratio, pixmap.height() / ratio)
+
+    def cover_updated(self, url):
+        """
+        封面下载到新内容时丢弃旧的解码结果；抽选页正在显示该封面时换成新内容。
+        """
+        self.pixmap_pool.invalidate(url)
+        if url == self.cover_url and self.cover_data is not None:
+            self.load_image(url, self.cover_name)
 
     def switch_to_draw_page(self):
         self.fade_out_current_page()
@@ -711,11 +1281,13 @@ class MaimaiDraw(QMainWindow):
         self.fade_in_new_page()
 
     def switch_to_settings_page(self):
+        self.ensure_page(1)
         self.fade_out_current_page()
         self.stack.setCurrentIndex(1)
         self.fade_in_new_page()
 
     def switch_to_search_page(self):
+        self.ensure_page(2)
         self.fade_out_current_page()
         self.stack.setCurrentIndex(2)
         self.fade_in_new_page()
@@ -744,20 +1316,197 @@ class MaimaiDraw(QMainWindow):
             self.showNormal()
             self.is_fullscreen = False
             self.fullscreen_btn.setText("最大化")
-            self.scale_widgets(1 / self.fullscreen_factor)
-            self.image_view.setFixedSize(300, 300)
         else:
             self.showFullScreen()
             self.is_fullscreen = True
             self.fullscreen_btn.setText("还原")
-            self.scale_widgets(self.fullscreen_factor)
-            self.image_view.setFixedSize(500, 500)
+        # 界面缩放由 resizeEvent 按新的窗口大小统一处理
 
-    def scale_widgets(self, factor):
-        for widget in self.findChildren(QWidget):
-            if widget is not self.fullscreen_btn:
-                widget.resize(widget.size() * factor)
-                widget.move(widget.pos() * factor)
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        scale = ui_scale_for(event.size().width(), event.size().height())
+        if scale != self.ui_scale:
+            self.apply_ui_scale(scale)
+
+    def apply_ui_scale(self, scale):
+        """
+        只调整少数固定尺寸的控件，其余控件由布局按窗口大小自动排列，
+        耗时与查找页中的曲目数量无关。
+        """
+        with profiler.span("ui.scale"):
+            self.ui_scale = scale
+            cover = round(COVER_SIZE * scale)
+            self.image_view.setFixedSize(cover, cover)
+            self.nav_frame.setFixedWidth(round(200 * scale))
+            self.start_btn.setFixedHeight(round(50 * scale))
+            self.animation_area.set_scale(scale)
+            self.set_pixel_size(self.result_label, round(24 * scale))
+            self.set_pixel_size(self.info_text, round(26 * scale))
+            self.show_cover()
+
+    @staticmethod
+    def set_pixel_size(widget, pixels):
+        # 直接修改字体，不给控件单独设置样式表，避免缩放时重新解析并应用样式
+        font = widget.font()
+        font.setPixelSize(pixels)
+        widget.setFont(font)
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出性能记录", "xmai_trace.json", "JSON文件 (*.json)")
+        if path:
+            try:
+                profiler.export_trace(path)
+                self.status_label.setText(f"性能记录已导出到 {path}")
+            except OSError as e:
+                QMessageBox.critical(self, "错误", f"导出失败：{str(e)}")
+
+    def event(self, event):
+        # 顶层窗口每次重绘都会收到 UpdateRequest，用来统计帧率
+        if event.type() != QEvent.UpdateRequest:
+            return super().event(event)
+        profiler.frame()
+        result = super().event(event)
+        if not self.first_frame_shown:
+            self.first_frame_shown = True
+            self.startup_report["first_frame_ms"] = (time.perf_counter() - STARTUP_TIME) * 1000
+            QTimer.singleShot(0, self.deferred_init)
+        return result
+
+    def deferred_init(self):
+        """
+        首帧之后再做的初始化：启动动态背景并输出启动耗时。
+        """
+        self.dynamic_background.start()
+        self.restore_session()
+        self.startup_report["ready_ms"] = (time.perf_counter() - STARTUP_TIME) * 1000
+        for name, ms in self.startup_report.items():
+            profiler.mark(f"startup.{name}", ms)
+        print("启动耗时：" + "，".join(f"{name} {ms:.0f} ms" for name, ms in self.startup_report.items()))
+
+    def schedule_session_save(self):
+        # 每次状态变化都重新计时，连续的变化只在最后写一次
+        self.session_timer.start()
+
+    def session_state(self):
+        active = self.catalogs.active
+        return {
+            "数据库": list(self.catalogs.catalogs),
+            "当前数据库": active.path if active is not None else None,
+            "等级": self.level,
+            "随机模式": self.random_mode,
+            "列表文件": self.partial_list_path,
+            "部分列表": self.partial_list,
+            "已选曲目": sorted(self.selected_songs),
+            "当前结果": self.current_result["基础信息"]["MusicID"] if self.current_result else None,
+            "防止重复": self.history.window,
+            "封面内存": self.pixmap_pool.budget_mb,
+            "封面来源": self.cover_source,
+        }
+
+    def save_session_now(self):
+        self.session_timer.stop()
+        try:
+            with profiler.span("session.save"):
+                save_session(self.session_state(), self.session_path)
+        except OSError as e:
+            if not self.session_save_failed:
+                self.session_save_failed = True
+                self.status_label.setText(f"会话无法保存，意外退出后将不能恢复：{e}")
+        else:
+            self.session_save_failed = False
+
+    def restore_session(self):
+        """
+        恢复上次的数据库、筛选条件、部分列表、勾选曲目与抽选结果。
+        """
+        try:
+            state = load_session(self.session_path)
+        except (OSError, ValueError) as e:
+            self.status_label.setText(f"上次的会话无法读取，已忽略：{e}")
+            return
+        if state is None:
+            return
+        start = time.perf_counter()
+        is_list = lambda value: type(value) is list
+        is_text = lambda value: type(value) is str
+        with profiler.span("session.restore"):
+            dropped = []
+            for path in session_value(state, "数据库", [], is_list):
+                if not is_text(path):
+                    # 整数会被 open() 当作文件描述符，必须先排除
+                    dropped.append(repr(path))
+                    continue
+                try:
+                    self.catalogs.load(path)
+                except Exception as e:
+                    # 文件缺失、损坏或格式不符时跳过该数据库，下次保存会话时不再记录
+                    dropped.append(f"{path}（{e}）")
+            current = session_value(state, "当前数据库", None, is_text)
+            if current in self.catalogs.catalogs:
+                self.catalogs.activate(current)
+            self.random_mode = session_value(state, "随机模式", 0, lambda value: value in (0, 1))
+            self.level = session_value(state, "等级", "全部等级", lambda value: value in ("全部等级", *LEVELS))
+            self.partial_list = [
+                item for item in session_value(state, "部分列表", [], is_list) if type(item) is str
+            ]
+            self.partial_list_path = session_value(state, "列表文件", None, is_text)
+            self.selected_songs = {
+                music_id for music_id in session_value(state, "已选曲目", [], is_list)
+                if type(music_id) is str
+            }
+            self.history.set_window(session_value(
+                state, "防止重复", self.history.window, lambda value: type(value) is int and 0 <= value <= 500
+            ))
+            self.pixmap_pool.set_budget(session_value(
+                state, "封面内存", self.pixmap_pool.budget_mb, lambda value: type(value) is int and 8 <= value <= 2048
+            ))
+            self.cover_source = session_value(state, "封面来源", "", is_text) or DEFAULT_COVER_SOURCE
+
+            # 设置页尚未创建时由 init_settings_page 按以上状态创建，已经创建过时逐项同步
+            if "level_combo" in self.__dict__:
+                for widget, setter, value in (
+                    (self.mode_combo, "setCurrentIndex", self.random_mode),
+                    (self.level_combo, "setCurrentText", self.level),
+                    (self.no_repeat_spin, "setValue", self.history.window),
+                    (self.pixmap_budget_spin, "setValue", self.pixmap_pool.budget_mb),
+                    (self.cover_source_edit, "setText", self.cover_source),
+                ):
+                    widget.blockSignals(True)
+                    getattr(widget, setter)(value)
+                    widget.blockSignals(False)
+                self.db_combo.clear()
+                for catalog in self.catalogs.catalogs.values():
+                    self.db_combo.addItem(catalog.name, catalog.path)
+                self.update_mode(self.random_mode)
+                if self.partial_list_path:
+                    self.txt_path.setText(os.path.basename(self.partial_list_path))
+                if self.catalogs.active is not None:
+                    self.db_combo.setCurrentIndex(self.db_combo.findData(self.catalogs.active.path))
+                    self.json_path.setText(self.catalogs.active.name)
+
+            active = self.catalogs.active
+            if active is not None:
+                self.filter_data()
+                result_id = state.get("当前结果")
+                self.current_result = next(
+                    (item for item in active.data if item["基础信息"]["MusicID"] == result_id), None
+                )
+                if self.current_result is not None:
+                    self.show_result()
+        elapsed = (time.perf_counter() - start) * 1000
+        profiler.mark("session.restore_ms", elapsed)
+        if dropped:
+            self.schedule_session_save()
+            self.status_label.setText("以下数据库无法加载，已从会话中移除：" + "，".join(dropped))
+        else:
+            self.status_label.setText(f"已恢复上次的会话（{elapsed:.0f} ms）")
+
+    def closeEvent(self, event):
+        if self.session_timer.isActive():
+            self.save_session_now()
+        self.history.close()
+        self.broadcast.stop()
+        super().closeEvent(event)
 
     def mousePressEvent(self, event):
         self.old_pos = event.globalPos()
@@ -784,15 +1533,14 @@ class MaimaiDraw(QMainWindow):
             if widget is not None:
                 widget.deleteLater()
         
-        if not query:
-            self.filtered_data = self.data
-        else:
-            self.filtered_data = [
-                item for item in self.data
-                if (query in item["基础信息"].get("歌名", "").lower() or
-                    any(query in alias.lower() for alias in item.get("别名", [])) or
-                    query in item["基础信息"].get("MusicID", "").lower())
-            ]
+        with profiler.span("search.query"):
+            if not query:
+                self.filtered_data = self.data
+            else:
+                self.filtered_data = [
+                    item for item in self.data
+                    if query in item["派生"]["搜索键"]
+                ]
         
         for item in self.filtered_data:
             song_info = item["基础信息"]
@@ -805,27 +1553,23 @@ class MaimaiDraw(QMainWindow):
             song_layout.setSpacing(10)
             
             # 歌曲名称和艺术家
-            song_label = QLabel(f"{song_info['歌名']} - {song_info.get('artist', '未知')}")
-            song_label.setStyleSheet(f"""
-                color: {STYLE['text']};
-                font-size: 14px;
-            """)
+            song_label = QLabel(item["派生"]["列表名"])
+            song_label.setObjectName("songLabel")
             
             # 复选框
             checkbox = QCheckBox()
             checkbox.setChecked(music_id in self.selected_songs)
             checkbox.stateChanged.connect(lambda state, mid=music_id, container=song_container: self.toggle_selection(state, mid, container))
             
-            # 图片
-            image_label = QLabel()
-            image_label.setFixedSize(50, 50)
-            image_label.setStyleSheet(f"""
-                background-color: {STYLE['secondary']};
-                border-radius: {STYLE['radius']};
-            """)
+            # 图片，滚动到可见区域时才加载
             if 'image_url' in song_info:
-                image_url = f"https://maimaidx.jp/maimai-mobile/img/Music/{song_info['image_url']}"
-                self.load_song_image(image_url, image_label)
+                image_url = cover_url(self.cover_source, song_info['image_url'])
+                image_label = CoverLabel(partial(self.load_song_image, image_url,
+                                                 image_name=song_info['image_url']))
+            else:
+                image_label = QLabel()
+            image_label.setFixedSize(50, 50)
+            image_label.setObjectName("songCover")
             
             song_layout.addWidget(checkbox)
             song_layout.addWidget(image_label)
@@ -833,26 +1577,23 @@ class MaimaiDraw(QMainWindow):
             
             self.scroll_layout.addWidget(song_container)
 
-    def load_song_image(self, url, label):
-        request = QNetworkRequest(QUrl(url))
-        reply = self.net_manager.get(request)
-        weak_label = weakref.ref(label)
-        reply.finished.connect(partial(self.handle_song_image_load, weak_label=weak_label, reply=reply))
+    def load_song_image(self, url, weak_label, image_name=None):
+        if weak_label() is None:
+            return
+        self.cover_cache.fetch(url, partial(self.handle_song_image_load, url=url, weak_label=weak_label,
+                                            image_name=image_name))
 
-    def handle_song_image_load(self, weak_label, reply):
+    def handle_song_image_load(self, data, url, weak_label, image_name=None):
         label = weak_label()  
         if label is None:
-            reply.deleteLater()
             return
         
-        if reply.error() == QNetworkReply.NoError:
-            data = reply.readAll()
-            pixmap = QPixmap()
-            pixmap.loadFromData(data)
-            label.setPixmap(pixmap.scaled(label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        if data is not None:
+            if image_name:
+                self.broadcast.put_cover(image_name, data)
+            self.pixmap_pool.show(label, url, data, label.width(), self.devicePixelRatioF())
         else:
             label.setText("图片加载失败")
-        reply.deleteLater()
 
     def toggle_selection(self, state, music_id, container):
         if state == Qt.Checked:
@@ -861,18 +1602,18 @@ class MaimaiDraw(QMainWindow):
         else:
             self.selected_songs.discard(music_id)
             self.remove_from_selected_songs_list(music_id)
+        self.schedule_session_save()
 
     def add_to_selected_songs_list(self, music_id, container):
         if music_id not in self.selected_songs_list:
 
             for item in self.filtered_data:
                 if item["基础信息"]["MusicID"] == music_id:
-                    song_info = item["基础信息"]
                     break
             else:
                 return
             
-            list_item = QListWidgetItem(f"{song_info['歌名']} - {song_info.get('artist', '未知')}")
+            list_item = QListWidgetItem(item["派生"]["列表名"])
             self.selected_songs_list[music_id] = list_item
             self.selected_songs_list_widget.addItem(list_item)
 
@@ -891,6 +1632,7 @@ class MaimaiDraw(QMainWindow):
         if music_id is not None:
             self.selected_songs.discard(music_id)
             self.remove_from_selected_songs_list(music_id)
+            self.schedule_session_save()
 
     def save_selected_songs(self):
         if not self.selected_songs:
@@ -911,6 +1653,9 @@ class MaimaiDraw(QMainWindow):
                 QMessageBox.critical(self, "错误", f"保存失败：{str(e)}")
 
 if __name__ == '__main__':
+    # 高分屏按系统缩放比例绘制，界面缩放只需处理窗口大小
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     font = QFont()
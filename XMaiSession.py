@@ -0,0 +1,38 @@
+import json
+import os
+import tempfile
+
+DEFAULT_SESSION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "session.json")
+SESSION_VERSION = 1
+
+
+def save_session(state, path=DEFAULT_SESSION_PATH):
+    """
+    原子地写入会话：先写同目录下的临时文件并落盘，再改名覆盖旧文件。
+    崩溃时磁盘上只会是旧会话或新会话，不会是写了一半的文件。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".session-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(dict(state, 版本=SESSION_VERSION), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def load_session(path=DEFAULT_SESSION_PATH):
+    """
+    读取会话，文件不存在或版本不符时返回 None；无法读取或内容损坏时抛出 OSError / ValueError。
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    if not isinstance(state, dict) or state.get("版本") != SESSION_VERSION:
+        return None
+    return state